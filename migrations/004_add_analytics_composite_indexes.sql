@@ -0,0 +1,15 @@
+-- Migration: Add composite indexes for dashboard analytics
+-- Purpose: Serve the per-student filtered counts in the analytics aggregator
+-- (student progress summary, override analytics) as index range scans
+
+-- Completed practice per student within a time window
+CREATE INDEX IF NOT EXISTS idx_pa_student_completed_at
+    ON practice_assignments(student_id, completed, completed_at);
+
+-- Sessions per student within a time window
+CREATE INDEX IF NOT EXISTS idx_sessions_student_date ON sessions(student_id, session_date);
+
+-- Override analytics filtered by subject/difficulty over a date range
+CREATE INDEX IF NOT EXISTS idx_overrides_subject_difficulty_created
+    ON overrides(subject_id, difficulty_level, created_at);
+
@@ -0,0 +1,6 @@
+-- Migration: Add GIN index on practice_assignments.goal_tags
+-- Purpose: Serve goal progress lookups (goal_tags @> ARRAY[goal_id]) with a
+-- bitmap index scan instead of a sequential scan
+
+CREATE INDEX IF NOT EXISTS idx_pa_goal_tags ON practice_assignments USING GIN(goal_tags);
+
@@ -0,0 +1,5 @@
+-- Migration: Add expression index on lower(subjects.name)
+-- Purpose: Serve case-insensitive subject lookups (lower(name) = lower(:name))
+-- with an index scan instead of a sequential scan
+
+CREATE INDEX IF NOT EXISTS idx_subjects_lower_name ON subjects (lower(name));
@@ -0,0 +1,7 @@
+-- Migration: Add composite index on nudges(user_id, sent_at)
+-- Purpose: Serve the per-user nudge frequency checks (nudges sent today,
+-- unopened nudges this week) as index range scans; opened_at is included so
+-- the unopened check does not visit the heap
+
+CREATE INDEX IF NOT EXISTS idx_nudges_user_sent_at
+    ON nudges(user_id, sent_at DESC) INCLUDE (opened_at);
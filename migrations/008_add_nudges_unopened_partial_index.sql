@@ -0,0 +1,6 @@
+-- Migration: Add partial index on unopened nudges
+-- Purpose: Answer "does this user have an unopened nudge this week?" from a
+-- small index holding only unopened nudges
+
+CREATE INDEX IF NOT EXISTS idx_nudges_user_unopened
+    ON nudges(user_id, sent_at DESC) WHERE opened_at IS NULL;
@@ -4,8 +4,9 @@ Parent and admin dashboard endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session as DBSession
+from sqlalchemy import select
 from typing import Optional
 from uuid import UUID
 from datetime import datetime, timedelta
@@ -270,6 +271,8 @@ async def export_data(
     
     aggregator = AnalyticsAggregator(db)
     exporter = DataExporter()
+    now = datetime.utcnow()
+    file_date = now.strftime('%Y%m%d')
     
     if data_type == "students":
         # Get all students with progress data
@@ -297,39 +300,58 @@ async def export_data(
             return Response(
                 content=content,
                 media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=students_{datetime.utcnow().strftime('%Y%m%d')}.csv"}
+                headers={"Content-Disposition": f"attachment; filename=students_{file_date}.csv"}
             )
         else:
             content = exporter.to_json(students_data)
             return Response(
                 content=content,
                 media_type="application/json",
-                headers={"Content-Disposition": f"attachment; filename=students_{datetime.utcnow().strftime('%Y%m%d')}.json"}
+                headers={"Content-Disposition": f"attachment; filename=students_{file_date}.json"}
             )
     
     elif data_type == "overrides":
         from src.models.override import Override
         from src.models.subject import Subject
         
-        query = db.query(Override)
+        filters = []
         
         if subject_id:
             try:
                 from uuid import UUID as UUIDType
                 subject_uuid = UUIDType(subject_id) if isinstance(subject_id, str) else subject_id
-                query = query.filter(Override.subject_id == subject_uuid)
+                filters.append(Override.subject_id == subject_uuid)
             except (ValueError, TypeError):
-                query = query.filter(Override.subject_id == subject_id)
+                filters.append(Override.subject_id == subject_id)
         
         if start_date:
             start = datetime.fromisoformat(start_date)
-            query = query.filter(Override.created_at >= start)
+            filters.append(Override.created_at >= start)
         
         if end_date:
             end = datetime.fromisoformat(end_date)
-            query = query.filter(Override.created_at <= end)
+            filters.append(Override.created_at <= end)
         
-        overrides = query.all()
+        if format == "csv":
+            # Stream rows in batches rather than loading every override into memory
+            stmt = select(
+                Override.id.label("override_id"),
+                Override.tutor_id,
+                Override.student_id,
+                Override.override_type,
+                Subject.name.label("subject"),
+                Override.difficulty_level,
+                Override.reason,
+                Override.created_at
+            ).outerjoin(Subject, Subject.id == Override.subject_id).where(*filters).execution_options(yield_per=1000)
+            
+            return StreamingResponse(
+                exporter.stream_overrides_csv(db.execute(stmt)),
+                media_type="text/csv",
+                headers={"Content-Disposition": f"attachment; filename=overrides_{file_date}.csv"}
+            )
+        
+        overrides = db.query(Override).filter(*filters).all()
         
         overrides_data = []
         for override in overrides:
@@ -345,20 +367,12 @@ async def export_data(
                 "created_at": override.created_at.isoformat() if hasattr(override.created_at, 'isoformat') else str(override.created_at)
             })
         
-        if format == "csv":
-            content = exporter.export_overrides_to_csv(overrides_data)
-            return Response(
-                content=content,
-                media_type="text/csv",
-                headers={"Content-Disposition": f"attachment; filename=overrides_{datetime.utcnow().strftime('%Y%m%d')}.csv"}
-            )
-        else:
-            content = exporter.to_json(overrides_data)
-            return Response(
-                content=content,
-                media_type="application/json",
-                headers={"Content-Disposition": f"attachment; filename=overrides_{datetime.utcnow().strftime('%Y%m%d')}.json"}
-            )
+        content = exporter.to_json(overrides_data)
+        return Response(
+            content=content,
+            media_type="application/json",
+            headers={"Content-Disposition": f"attachment; filename=overrides_{file_date}.json"}
+        )
     
     else:  # analytics
         start = datetime.fromisoformat(start_date) if start_date else None
@@ -369,13 +383,13 @@ async def export_data(
             "override_analytics": aggregator.get_override_analytics(start_date=start, end_date=end),
             "confidence_analytics": aggregator.get_confidence_analytics(start_date=start, end_date=end),
             "nudge_analytics": aggregator.get_nudge_analytics(start_date=start, end_date=end),
-            "exported_at": datetime.utcnow().isoformat()
+            "exported_at": now.isoformat()
         }
         
         content = exporter.export_analytics_to_json(analytics_data)
         return Response(
             content=content,
             media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=analytics_{datetime.utcnow().strftime('%Y%m%d')}.json"}
+            headers={"Content-Disposition": f"attachment; filename=analytics_{file_date}.json"}
         )
 
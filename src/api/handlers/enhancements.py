@@ -198,6 +198,8 @@ async def send_batch_emails(
 ):
     """Send batch emails"""
     email_service = EmailService(db)
-    result = email_service.send_batch_emails(emails)
+    results = []
+    result = email_service.send_batch_emails(emails, on_result=results.append)
+    result["results"] = results
     return {"success": result.get("success"), "data": result}
 
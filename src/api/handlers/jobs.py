@@ -7,6 +7,8 @@ WebSocket /jobs/{job_id}/ws - Real-time job updates
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session as DBSession
 from uuid import UUID
+from typing import Optional
+from concurrent.futures import Future
 import json
 import asyncio
 import logging
@@ -22,6 +24,9 @@ router = APIRouter(prefix="/jobs", tags=["jobs"])
 # Store active WebSocket connections
 active_connections: dict[UUID, list[WebSocket]] = {}
 
+# Event loop serving the WebSocket connections (set when a client connects)
+_connections_loop: Optional[asyncio.AbstractEventLoop] = None
+
 
 @router.get("/{job_id}")
 async def get_job_status(
@@ -71,6 +76,9 @@ async def websocket_job_updates(websocket: WebSocket, job_id: UUID):
     """
     await websocket.accept()
     
+    global _connections_loop
+    _connections_loop = asyncio.get_running_loop()
+    
     # Add to active connections
     if job_id not in active_connections:
         active_connections[job_id] = []
@@ -199,3 +207,17 @@ async def broadcast_job_update(job_id: UUID, update: dict):
     if not active_connections[job_id]:
         del active_connections[job_id]
 
+
+
+def publish_job_update(job_id: UUID, update: dict) -> Optional[Future]:
+    """
+    Schedule a job update broadcast from synchronous code
+    
+    Job processing runs on worker threads with no event loop of their own, so
+    the broadcast is handed to the loop that owns the WebSocket connections.
+    Returns None when nobody is listening for this job.
+    """
+    loop = _connections_loop
+    if loop is None or job_id not in active_connections:
+        return None
+    return asyncio.run_coroutine_threadsafe(broadcast_job_update(job_id, update), loop)
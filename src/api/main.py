@@ -8,6 +8,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import SQLAlchemyError
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from src.config.settings import settings
@@ -20,6 +21,7 @@ from src.api.middleware.error_handlers import (
 )
 from src.api.middleware.request_logging import RequestLoggingMiddleware
 from src.api.middleware.metrics import MetricsMiddleware
+from src.services.integrations.webhooks import run_webhook_retry_loop
 from src.utils.logging_config import setup_logging
 
 
@@ -42,10 +44,14 @@ async def lifespan(app: FastAPI):
         raise RuntimeError("Database connection failed on startup")
     logger.info("Database connection verified")
     
+    # Redeliver failed webhooks as their backoff expires
+    webhook_retries = asyncio.create_task(run_webhook_retry_loop())
+    
     yield
     
     # Shutdown
     logger.info("Shutting down AI Study Companion API...")
+    webhook_retries.cancel()
 
 
 # Create FastAPI app
@@ -38,6 +38,7 @@ class Settings(BaseSettings):
     # SES
     ses_from_email: str = Field(default="noreply@example.com", description="SES from email")
     ses_region: str = Field(default="us-east-1", description="SES region")
+    ses_tps: int = Field(default=14, gt=0, description="SES max sends per second")
     
     # S3
     s3_bucket_name: Optional[str] = Field(default=None, description="S3 bucket for transcripts")
@@ -2,7 +2,7 @@
 Override Model
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -36,6 +36,10 @@ class Override(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     
+    __table_args__ = (
+        Index('idx_overrides_subject_difficulty_created', 'subject_id', 'difficulty_level', 'created_at'),
+    )
+    
     # Relationships
     tutor = relationship("User", foreign_keys=[tutor_id], backref="overrides_as_tutor")
     student = relationship("User", foreign_keys=[student_id], backref="overrides_as_student")
@@ -2,7 +2,7 @@
 Practice Models
 """
 
-from sqlalchemy import Column, String, Text, Integer, Boolean, Numeric, ARRAY, ForeignKey, CheckConstraint, DateTime
+from sqlalchemy import Column, String, Text, Integer, Boolean, Numeric, ARRAY, ForeignKey, CheckConstraint, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -75,6 +75,11 @@ class PracticeAssignment(Base):
     assigned_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     
+    __table_args__ = (
+        Index('idx_pa_student_completed_at', 'student_id', 'completed', 'completed_at'),
+        Index('idx_pa_goal_tags', 'goal_tags', postgresql_using='gin'),
+    )
+    
     # Relationships
     student = relationship("User", backref="practice_assignments")
     bank_item = relationship("PracticeBankItem", backref="assignments")
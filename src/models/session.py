@@ -2,7 +2,7 @@
 Session Model
 """
 
-from sqlalchemy import Column, String, DateTime, Integer, Boolean, Text, ARRAY, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, Boolean, Text, ARRAY, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -30,6 +30,10 @@ class Session(Base, TimestampMixin):
     topics_covered = Column(ARRAY(String))
     notes = Column(Text)
     
+    __table_args__ = (
+        Index('idx_sessions_student_date', 'student_id', 'session_date'),
+    )
+    
     # Relationships
     student = relationship("User", foreign_keys=[student_id], backref="sessions_as_student")
     tutor = relationship("User", foreign_keys=[tutor_id], backref="sessions_as_tutor")
@@ -4,33 +4,60 @@ Aggregate and analyze data for dashboards and reports
 """
 
 import logging
+from functools import lru_cache
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
+from uuid import UUID
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
 
-# Import models - will use test models if available
+# Import models - will use test models if available. Bound once at import
+# so the query methods don't re-resolve them on every call.
 try:
     from tests.test_models import (
-        TestUser, TestGoal, TestPracticeAssignment, TestQAInteraction,
-        TestSession, TestSummary, TestOverride, TestNudge, TestSubject
+        TestUser as UserModel,
+        TestGoal as GoalModel,
+        TestPracticeAssignment as PracticeModel,
+        TestQAInteraction as QAModel,
+        TestSession as SessionModelClass,
+        TestOverride as OverrideModel,
+        TestNudge as NudgeModel,
+        TestSubject as SubjectModel
     )
     USE_TEST_MODELS = True
 except ImportError:
     USE_TEST_MODELS = False
-    from src.models.user import User
-    from src.models.goal import Goal
-    from src.models.practice import PracticeAssignment
-    from src.models.qa import QAInteraction
-    from src.models.session import Session as SessionModel
-    from src.models.summary import Summary
-    from src.models.override import Override
-    from src.models.nudge import Nudge
-    from src.models.subject import Subject
+    from src.models.user import User as UserModel
+    from src.models.goal import Goal as GoalModel
+    from src.models.practice import PracticeAssignment as PracticeModel
+    from src.models.qa import QAInteraction as QAModel
+    from src.models.session import Session as SessionModelClass
+    from src.models.override import Override as OverrideModel
+    from src.models.nudge import Nudge as NudgeModel
+    from src.models.subject import Subject as SubjectModel
 
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=4096)
+def _to_uuid_or_str(value):
+    """Parse an ID string as a UUID, returning the input unchanged if it isn't one"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return UUID(value)
+    except ValueError:
+        return value
+
+
+def _period(start_date: Optional[datetime], end_date: Optional[datetime]) -> Dict:
+    """Build the reporting period block shared by the date-filtered analytics"""
+    return {
+        "start": start_date.isoformat() if start_date else None,
+        "end": end_date.isoformat() if end_date else None
+    }
+
+
 class AnalyticsAggregator:
     """Aggregate analytics data for dashboards and reports"""
     
@@ -39,29 +66,14 @@ class AnalyticsAggregator:
     
     def get_student_progress_summary(self, student_id: str) -> Dict:
         """Get comprehensive progress summary for a student"""
-        try:
-            from uuid import UUID as UUIDType
-            student_uuid = UUIDType(student_id) if isinstance(student_id, str) else student_id
-        except (ValueError, TypeError):
-            student_uuid = student_id
-        
-        # Get student (use test models if available)
+        # Get student (test models store IDs as strings)
         if USE_TEST_MODELS:
-            student = self.db.query(TestUser).filter(TestUser.id == student_id).first()
-            UserModel = TestUser
-            GoalModel = TestGoal
-            PracticeModel = TestPracticeAssignment
-            SessionModelClass = TestSession
-            QAModel = TestQAInteraction
+            student = self.db.query(UserModel).filter(UserModel.id == student_id).first()
         else:
-            student = self.db.query(User).filter(User.id == student_uuid).first()
-            if not student:
-                student = self.db.query(User).filter(User.id == student_id).first()
-            UserModel = User
-            GoalModel = Goal
-            PracticeModel = PracticeAssignment
-            SessionModelClass = SessionModel
-            QAModel = QAInteraction
+            student_uuid = _to_uuid_or_str(student_id)
+            student = self.db.query(UserModel).filter(UserModel.id == student_uuid).first()
+            if not student and student_uuid is not student_id:
+                student = self.db.query(UserModel).filter(UserModel.id == student_id).first()
         
         if not student:
             raise ValueError(f"Student {student_id} not found")
@@ -74,37 +86,33 @@ class AnalyticsAggregator:
         active_goals = [g for g in goals if g.status == "active"]
         completed_goals = [g for g in goals if g.status == "completed"]
         
+        # Recent activity window (last 30 days), counted alongside the totals
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        
         # Get practice stats
         practice_stats = self.db.query(
             func.count(PracticeModel.id).label("total"),
             func.count(PracticeModel.id).filter(PracticeModel.completed == True).label("completed"),
-            func.avg(PracticeModel.performance_score).label("avg_score")
+            func.avg(PracticeModel.performance_score).label("avg_score"),
+            func.count(PracticeModel.id).filter(
+                PracticeModel.completed == True,
+                PracticeModel.completed_at >= thirty_days_ago
+            ).label("recent")
         ).filter(PracticeModel.student_id == actual_student_id).first()
         
         # Get session stats
-        session_count = self.db.query(func.count(SessionModelClass.id)).filter(
-            SessionModelClass.student_id == actual_student_id
-        ).scalar() or 0
+        session_stats = self.db.query(
+            func.count(SessionModelClass.id).label("total"),
+            func.count(SessionModelClass.id).filter(
+                SessionModelClass.session_date >= thirty_days_ago
+            ).label("recent")
+        ).filter(SessionModelClass.student_id == actual_student_id).first()
         
         # Get Q&A stats
         qa_count = self.db.query(func.count(QAModel.id)).filter(
             QAModel.student_id == actual_student_id
         ).scalar() or 0
         
-        # Get recent activity (last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        recent_practice = self.db.query(func.count(PracticeModel.id)).filter(
-            PracticeModel.student_id == actual_student_id,
-            PracticeModel.completed == True,
-            PracticeModel.completed_at >= thirty_days_ago
-        ).scalar() or 0
-        
-        recent_sessions = self.db.query(func.count(SessionModelClass.id)).filter(
-            SessionModelClass.student_id == actual_student_id,
-            SessionModelClass.session_date >= thirty_days_ago
-        ).scalar() or 0
-        
         return {
             "student_id": str(student_id),
             "goals": {
@@ -118,11 +126,11 @@ class AnalyticsAggregator:
                 "completed": practice_stats.completed or 0,
                 "completion_rate": (practice_stats.completed / practice_stats.total * 100) if practice_stats.total else 0.0,
                 "average_score": float(practice_stats.avg_score) if practice_stats.avg_score else 0.0,
-                "recent_30_days": recent_practice
+                "recent_30_days": practice_stats.recent or 0
             },
             "sessions": {
-                "total": session_count,
-                "recent_30_days": recent_sessions
+                "total": session_stats.total or 0,
+                "recent_30_days": session_stats.recent or 0
             },
             "qa": {
                 "total_queries": qa_count
@@ -137,13 +145,6 @@ class AnalyticsAggregator:
         end_date: Optional[datetime] = None
     ) -> Dict:
         """Get override frequency analytics"""
-        if USE_TEST_MODELS:
-            OverrideModel = TestOverride
-            SubjectModel = TestSubject
-        else:
-            OverrideModel = Override
-            SubjectModel = Subject
-        
         query = self.db.query(OverrideModel)
         
         # Apply filters
@@ -151,12 +152,7 @@ class AnalyticsAggregator:
             if USE_TEST_MODELS:
                 query = query.filter(OverrideModel.subject_id == subject_id)
             else:
-                try:
-                    from uuid import UUID as UUIDType
-                    subject_uuid = UUIDType(subject_id) if isinstance(subject_id, str) else subject_id
-                    query = query.filter(OverrideModel.subject_id == subject_uuid)
-                except (ValueError, TypeError):
-                    query = query.filter(OverrideModel.subject_id == subject_id)
+                query = query.filter(OverrideModel.subject_id == _to_uuid_or_str(subject_id))
         
         if difficulty_level:
             query = query.filter(OverrideModel.difficulty_level == difficulty_level)
@@ -184,12 +180,8 @@ class AnalyticsAggregator:
                 if USE_TEST_MODELS:
                     subject = self.db.query(SubjectModel).filter(SubjectModel.id == override.subject_id).first()
                 else:
-                    try:
-                        from uuid import UUID as UUIDType
-                        subject_uuid = UUIDType(override.subject_id) if isinstance(override.subject_id, str) else override.subject_id
-                        subject = self.db.query(SubjectModel).filter(SubjectModel.id == subject_uuid).first()
-                    except (ValueError, TypeError):
-                        subject = self.db.query(SubjectModel).filter(SubjectModel.id == override.subject_id).first()
+                    subject_uuid = _to_uuid_or_str(override.subject_id)
+                    subject = self.db.query(SubjectModel).filter(SubjectModel.id == subject_uuid).first()
                 subject_name = subject.name if subject else "Unknown"
                 if subject_name not in by_subject:
                     by_subject[subject_name] = 0
@@ -209,10 +201,7 @@ class AnalyticsAggregator:
             "by_type": by_type,
             "by_subject": by_subject,
             "by_difficulty": by_difficulty,
-            "period": {
-                "start": start_date.isoformat() if start_date else None,
-                "end": end_date.isoformat() if end_date else None
-            }
+            "period": _period(start_date, end_date)
         }
     
     def get_confidence_analytics(
@@ -221,12 +210,15 @@ class AnalyticsAggregator:
         end_date: Optional[datetime] = None
     ) -> Dict:
         """Get confidence distribution analytics"""
-        if USE_TEST_MODELS:
-            QAModel = TestQAInteraction
-        else:
-            QAModel = QAInteraction
-        
-        query = self.db.query(QAModel)
+        # Aggregate in the database: one row regardless of interaction volume
+        query = self.db.query(
+            func.count(QAModel.id).label("total"),
+            func.count(QAModel.id).filter(QAModel.confidence == "High").label("high"),
+            func.count(QAModel.id).filter(QAModel.confidence == "Medium").label("medium"),
+            func.count(QAModel.id).filter(QAModel.confidence == "Low").label("low"),
+            func.count(QAModel.id).filter(QAModel.tutor_escalation_suggested == True).label("escalations"),
+            func.avg(QAModel.confidence_score).filter(QAModel.confidence_score != 0).label("avg_score")
+        )
         
         if start_date:
             query = query.filter(QAModel.created_at >= start_date)
@@ -234,9 +226,9 @@ class AnalyticsAggregator:
         if end_date:
             query = query.filter(QAModel.created_at <= end_date)
         
-        interactions = query.all()
+        stats = query.first()
         
-        total = len(interactions)
+        total = stats.total or 0
         if total == 0:
             return {
                 "total_queries": 0,
@@ -246,20 +238,8 @@ class AnalyticsAggregator:
             }
         
         # Count by confidence
-        confidence_counts = {"High": 0, "Medium": 0, "Low": 0}
-        confidence_scores = []
-        escalations = 0
-        
-        for interaction in interactions:
-            confidence = interaction.confidence
-            if confidence in confidence_counts:
-                confidence_counts[confidence] += 1
-            
-            if interaction.confidence_score:
-                confidence_scores.append(float(interaction.confidence_score))
-            
-            if interaction.tutor_escalation_suggested:
-                escalations += 1
+        confidence_counts = {"High": stats.high or 0, "Medium": stats.medium or 0, "Low": stats.low or 0}
+        escalations = stats.escalations or 0
         
         # Calculate percentages
         confidence_distribution = {
@@ -273,11 +253,8 @@ class AnalyticsAggregator:
             "confidence_distribution": confidence_distribution,
             "confidence_counts": confidence_counts,
             "escalation_rate": round(escalations / total * 100, 2),
-            "average_confidence_score": round(sum(confidence_scores) / len(confidence_scores), 2) if confidence_scores else 0.0,
-            "period": {
-                "start": start_date.isoformat() if start_date else None,
-                "end": end_date.isoformat() if end_date else None
-            }
+            "average_confidence_score": round(float(stats.avg_score), 2) if stats.avg_score is not None else 0.0,
+            "period": _period(start_date, end_date)
         }
     
     def get_nudge_analytics(
@@ -286,12 +263,13 @@ class AnalyticsAggregator:
         end_date: Optional[datetime] = None
     ) -> Dict:
         """Get nudge engagement analytics"""
-        if USE_TEST_MODELS:
-            NudgeModel = TestNudge
-        else:
-            NudgeModel = Nudge
-        
-        query = self.db.query(NudgeModel)
+        # Bucket by type in the database instead of iterating nudges in Python
+        query = self.db.query(
+            NudgeModel.type,
+            func.count(NudgeModel.id).label("sent"),
+            func.count(NudgeModel.opened_at).label("opened"),
+            func.count(NudgeModel.clicked_at).label("clicked")
+        )
         
         if start_date:
             query = query.filter(NudgeModel.sent_at >= start_date)
@@ -299,9 +277,9 @@ class AnalyticsAggregator:
         if end_date:
             query = query.filter(NudgeModel.sent_at <= end_date)
         
-        nudges = query.all()
+        rows = query.group_by(NudgeModel.type).all()
         
-        total = len(nudges)
+        total = sum(row.sent for row in rows)
         if total == 0:
             return {
                 "total_nudges": 0,
@@ -315,23 +293,12 @@ class AnalyticsAggregator:
             }
         
         # Group by type
-        by_type = {}
-        opened = 0
-        clicked = 0
-        
-        for nudge in nudges:
-            nudge_type = nudge.type
-            if nudge_type not in by_type:
-                by_type[nudge_type] = {"sent": 0, "opened": 0, "clicked": 0}
-            by_type[nudge_type]["sent"] += 1
-            
-            if nudge.opened_at:
-                opened += 1
-                by_type[nudge_type]["opened"] += 1
-            
-            if nudge.clicked_at:
-                clicked += 1
-                by_type[nudge_type]["clicked"] += 1
+        by_type = {
+            row.type: {"sent": row.sent, "opened": row.opened, "clicked": row.clicked}
+            for row in rows
+        }
+        opened = sum(row.opened for row in rows)
+        clicked = sum(row.clicked for row in rows)
         
         return {
             "total_nudges": total,
@@ -342,51 +309,45 @@ class AnalyticsAggregator:
                 "opened_rate": round(opened / total * 100, 2),
                 "clicked_rate": round(clicked / total * 100, 2)
             },
-            "period": {
-                "start": start_date.isoformat() if start_date else None,
-                "end": end_date.isoformat() if end_date else None
-            }
+            "period": _period(start_date, end_date)
         }
     
     def get_platform_overview(self) -> Dict:
         """Get overall platform statistics"""
-        if USE_TEST_MODELS:
-            UserModel = TestUser
-            GoalModel = TestGoal
-            PracticeModel = TestPracticeAssignment
-            QAModel = TestQAInteraction
-            SessionModelClass = TestSession
-        else:
-            UserModel = User
-            GoalModel = Goal
-            PracticeModel = PracticeAssignment
-            QAModel = QAInteraction
-            SessionModelClass = SessionModel
-        
-        # User counts
-        total_users = self.db.query(func.count(UserModel.id)).scalar() or 0
-        students = self.db.query(func.count(UserModel.id)).filter(UserModel.role == "student").scalar() or 0
-        tutors = self.db.query(func.count(UserModel.id)).filter(UserModel.role == "tutor").scalar() or 0
-        
-        # Activity counts
-        total_sessions = self.db.query(func.count(SessionModelClass.id)).scalar() or 0
-        total_practice = self.db.query(func.count(PracticeModel.id)).filter(
-            PracticeModel.completed == True
-        ).scalar() or 0
-        total_qa = self.db.query(func.count(QAModel.id)).scalar() or 0
-        total_goals = self.db.query(func.count(GoalModel.id)).scalar() or 0
-        active_goals = self.db.query(func.count(GoalModel.id)).filter(GoalModel.status == "active").scalar() or 0
-        
-        # Recent activity (last 7 days)
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        recent_sessions = self.db.query(func.count(SessionModelClass.id)).filter(
-            SessionModelClass.session_date >= seven_days_ago
-        ).scalar() or 0
         
-        recent_practice = self.db.query(func.count(PracticeModel.id)).filter(
-            PracticeModel.completed == True,
-            PracticeModel.completed_at >= seven_days_ago
-        ).scalar() or 0
+        def count(model, *criteria):
+            return select(func.count(model.id)).where(*criteria).scalar_subquery()
+        
+        # All counts are independent, so fetch them in a single round-trip
+        stats = self.db.query(
+            count(UserModel).label("total_users"),
+            count(UserModel, UserModel.role == "student").label("students"),
+            count(UserModel, UserModel.role == "tutor").label("tutors"),
+            count(SessionModelClass).label("total_sessions"),
+            count(PracticeModel, PracticeModel.completed == True).label("total_practice"),
+            count(QAModel).label("total_qa"),
+            count(GoalModel).label("total_goals"),
+            count(GoalModel, GoalModel.status == "active").label("active_goals"),
+            # Recent activity (last 7 days)
+            count(SessionModelClass, SessionModelClass.session_date >= seven_days_ago).label("recent_sessions"),
+            count(
+                PracticeModel,
+                PracticeModel.completed == True,
+                PracticeModel.completed_at >= seven_days_ago
+            ).label("recent_practice")
+        ).one()
+        
+        total_users = stats.total_users or 0
+        students = stats.students or 0
+        tutors = stats.tutors or 0
+        total_sessions = stats.total_sessions or 0
+        total_practice = stats.total_practice or 0
+        total_qa = stats.total_qa or 0
+        total_goals = stats.total_goals or 0
+        active_goals = stats.active_goals or 0
+        recent_sessions = stats.recent_sessions or 0
+        recent_practice = stats.recent_practice or 0
         
         return {
             "users": {
@@ -3,16 +3,78 @@ Data Exporter
 Export data to CSV and JSON formats
 """
 
-import csv
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, TYPE_CHECKING
 from io import StringIO
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+if TYPE_CHECKING:
+    from sqlalchemy.engine import Result
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
 
+def _json_default(obj: Any) -> Any:
+    """Custom JSON serializer for datetime and other types"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Type {type(obj)} not serializable")
+
+
+# orjson's output format (compact, non-ASCII kept), which the stdlib fallbacks
+# reproduce so exports don't depend on whether orjson is installed
+_COMPACT_SEPARATORS = (",", ":")
+
+if orjson is not None:
+    def _json_cell(value: Any) -> str:
+        return orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    def _json_cell(value: Any) -> str:
+        return json.dumps(value, default=_json_default, separators=_COMPACT_SEPARATORS, ensure_ascii=False)
+
+
+def _empty_cell(value: Any) -> str:
+    return ""
+
+
+# Exact-type dispatch for CSV cell coercion (one dict lookup per cell instead
+# of an isinstance chain). Subclasses fall through to _convert_cell.
+_CELL_CONVERTERS = {
+    type(None): _empty_cell,
+    str: str,
+    int: str,
+    float: str,
+    bool: str,
+    dict: _json_cell,
+    list: _json_cell,
+    datetime: datetime.isoformat,
+    # Column types returned by Core selects (see stream_csv)
+    date: date.isoformat,
+    UUID: str,
+    Decimal: str,
+}
+
+
+def _convert_cell(value: Any) -> str:
+    """Convert a single CSV cell value to a string"""
+    converter = _CELL_CONVERTERS.get(type(value))
+    if converter is not None:
+        return converter(value)
+    if isinstance(value, (dict, list)):
+        return _json_cell(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
 class DataExporter:
     """Export data to various formats"""
     
@@ -31,6 +93,8 @@ class DataExporter:
         if not data:
             return ""
         
+        import csv
+        
         output = StringIO()
         
         # Get fieldnames
@@ -42,20 +106,42 @@ class DataExporter:
         
         for row in data:
             # Convert complex types to strings
-            cleaned_row = {}
-            for key, value in row.items():
-                if value is None:
-                    cleaned_row[key] = ""
-                elif isinstance(value, (dict, list)):
-                    cleaned_row[key] = json.dumps(value)
-                elif isinstance(value, datetime):
-                    cleaned_row[key] = value.isoformat()
-                else:
-                    cleaned_row[key] = str(value)
-            writer.writerow(cleaned_row)
+            writer.writerow({key: _convert_cell(value) for key, value in row.items()})
         
         return output.getvalue()
     
+    @staticmethod
+    def stream_csv(result: "Result", fieldnames: List[str], partition_size: int = 1000) -> Iterator[str]:
+        """
+        Stream a query result as CSV text, one chunk per partition of rows
+        
+        Callers should execute a Core select() with
+        ``.execution_options(yield_per=partition_size)`` so the driver fetches
+        rows in batches instead of buffering the whole result.
+        
+        Args:
+            result: SQLAlchemy Result whose columns are labelled with the fieldnames
+            fieldnames: Columns to export, in order
+            partition_size: Number of rows written per yielded chunk
+        
+        Yields:
+            CSV text chunks (header first)
+        """
+        import csv
+        
+        output = StringIO()
+        writer = csv.writer(output)
+        writer.writerow(fieldnames)
+        yield output.getvalue()
+        
+        for partition in result.partitions(partition_size):
+            output.seek(0)
+            output.truncate(0)
+            for row in partition:
+                mapping = row._mapping
+                writer.writerow([_convert_cell(mapping[name]) for name in fieldnames])
+            yield output.getvalue()
+    
     @staticmethod
     def to_json(data: Any, indent: int = 2) -> str:
         """
@@ -68,13 +154,20 @@ class DataExporter:
         Returns:
             JSON string
         """
-        def json_serializer(obj):
-            """Custom JSON serializer for datetime and other types"""
-            if isinstance(obj, datetime):
-                return obj.isoformat()
-            raise TypeError(f"Type {type(obj)} not serializable")
+        # orjson only supports 2-space indentation; other widths use stdlib json
+        if orjson is not None and indent in (2, None):
+            option = orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(data, default=_json_default, option=option).decode()
         
-        return json.dumps(data, indent=indent, default=json_serializer, ensure_ascii=False)
+        return json.dumps(
+            data,
+            indent=indent,
+            default=_json_default,
+            separators=_COMPACT_SEPARATORS if indent is None else None,
+            ensure_ascii=False
+        )
     
     @staticmethod
     def export_students_to_csv(students: List[Dict]) -> str:
@@ -86,14 +179,20 @@ class DataExporter:
         ]
         return DataExporter.to_csv(students, fieldnames)
     
+    OVERRIDE_FIELDNAMES = [
+        "override_id", "tutor_id", "student_id", "override_type",
+        "subject", "difficulty_level", "reason", "created_at"
+    ]
+    
     @staticmethod
     def export_overrides_to_csv(overrides: List[Dict]) -> str:
         """Export override data to CSV"""
-        fieldnames = [
-            "override_id", "tutor_id", "student_id", "override_type",
-            "subject", "difficulty_level", "reason", "created_at"
-        ]
-        return DataExporter.to_csv(overrides, fieldnames)
+        return DataExporter.to_csv(overrides, DataExporter.OVERRIDE_FIELDNAMES)
+    
+    @staticmethod
+    def stream_overrides_csv(result: "Result") -> Iterator[str]:
+        """Stream override rows to CSV (see stream_csv)"""
+        return DataExporter.stream_csv(result, DataExporter.OVERRIDE_FIELDNAMES)
     
     @staticmethod
     def export_analytics_to_json(analytics: Dict) -> str:
@@ -3,9 +3,10 @@ Goal Progress Service
 Automatically updates goal completion_percentage based on student activity
 """
 
-from typing import Optional, List
-from sqlalchemy.orm import Session as DBSession
-from sqlalchemy import func
+from typing import Optional, List, Dict
+from sqlalchemy.orm import Session as DBSession, load_only
+from sqlalchemy import select, update, case, func, cast, ARRAY, Text
+from sqlalchemy.dialects.postgresql import array
 from datetime import datetime, timezone
 from uuid import UUID
 
@@ -16,12 +17,35 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Completed practice items that count as 100% practice progress, by goal type
+DEFAULT_TARGET_ITEMS = 50
+TARGET_ITEMS_BY_GOAL_TYPE = {
+    "SAT": 100,  # SAT goals require more practice
+    "AP": 75,  # AP goals require moderate practice
+}
+
+# Weights of each progress component in completion_percentage
+PRACTICE_WEIGHT = 0.60
+ELO_WEIGHT = 0.30
+SESSION_WEIGHT = 0.10
+
+# Elo progress: improvement over the starting rating, 500 points = 100%
+STARTING_RATING = 1000
+TARGET_RATING_IMPROVEMENT = 500
+
+# Session progress: 10 sessions = 100%
+TARGET_SESSIONS = 10
+
 
 class GoalProgressService:
     """Service for updating goal progress based on student activity"""
     
     def __init__(self, db: DBSession):
         self.db = db
+        # Per-instance memo keyed by (student_id, subject_id). Services are
+        # created per request, so these never outlive the request.
+        self._rating_cache: Dict = {}
+        self._session_count_cache: Dict = {}
     
     def update_goal_progress_from_practice(
         self,
@@ -40,44 +64,44 @@ class GoalProgressService:
         if not goal_tags and not subject_id:
             return
         
+        try:
+            student_uuid = UUID(student_id) if isinstance(student_id, str) else student_id
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Invalid student_id in update_goal_progress_from_practice: {student_id}, {e}")
+            return
+        
         # Find goals linked to this practice item
         goals_to_update = []
         
         if goal_tags:
-            # Find goals by their IDs in goal_tags
+            # Find goals by their IDs in goal_tags (one query for all tags)
+            goal_uuids = set()
             for goal_id in goal_tags:
                 try:
-                    # Try to convert to UUID if it's a string
-                    goal_uuid = UUID(goal_id) if isinstance(goal_id, str) else goal_id
-                    goal = self.db.query(Goal).filter(
-                        Goal.id == goal_uuid,
-                        Goal.student_id == UUID(student_id) if isinstance(student_id, str) else student_id,
-                        Goal.status == "active"
-                    ).first()
-                    if goal and goal not in goals_to_update:
-                        goals_to_update.append(goal)
+                    goal_uuids.add(UUID(goal_id) if isinstance(goal_id, str) else goal_id)
                 except (ValueError, TypeError) as e:
                     logger.warning(f"Invalid goal_id in goal_tags: {goal_id}, {e}")
+            
+            if goal_uuids:
+                goals_to_update = self._goal_query().filter(
+                    Goal.id.in_(goal_uuids),
+                    Goal.student_id == student_uuid,
+                    Goal.status == "active"
+                ).all()
         
         # Fallback: if no goal_tags but subject_id provided, find goals by subject
         if not goals_to_update and subject_id:
             try:
-                student_uuid = UUID(student_id) if isinstance(student_id, str) else student_id
                 subject_uuid = UUID(subject_id) if isinstance(subject_id, str) else subject_id
-                goals_by_subject = self.db.query(Goal).filter(
+                goals_to_update = self._goal_query().filter(
                     Goal.student_id == student_uuid,
                     Goal.subject_id == subject_uuid,
                     Goal.status == "active"
                 ).all()
-                for goal in goals_by_subject:
-                    if goal not in goals_to_update:
-                        goals_to_update.append(goal)
             except (ValueError, TypeError) as e:
                 logger.warning(f"Invalid UUID in update_goal_progress_from_practice: {e}")
         
-        # Update each goal's progress
-        for goal in goals_to_update:
-            self._calculate_and_update_goal_progress(goal)
+        self._update_goals(goals_to_update)
     
     def update_goal_progress_from_session(
         self,
@@ -95,122 +119,216 @@ class GoalProgressService:
             return
         
         # Find active goals for this subject
-        goals = self.db.query(Goal).filter(
+        goals = self._goal_query().filter(
             Goal.student_id == student_id,
             Goal.subject_id == subject_id,
             Goal.status == "active"
         ).all()
         
-        for goal in goals:
-            self._calculate_and_update_goal_progress(goal)
+        self._update_goals(goals)
     
-    def _calculate_and_update_goal_progress(self, goal: Goal) -> None:
+    def _goal_query(self):
         """
-        Calculate and update a goal's completion_percentage
+        Query goals loading only the columns progress calculation uses
         
-        Progress is calculated based on:
-        1. Practice items completed (60% weight)
-        2. Elo rating improvement (30% weight)
-        3. Sessions completed (10% weight)
+        Progress never touches Goal relationships (student, subject), so they
+        are left lazy rather than eager-loaded.
+        """
+        return self.db.query(Goal).options(load_only(
+            Goal.id, Goal.student_id, Goal.subject_id, Goal.goal_type,
+            Goal.status, Goal.completion_percentage, Goal.completed_at
+        ))
+    
+    def _update_goals(self, goals: List[Goal]) -> None:
         """
+        Recalculate progress for a student's goals
+        
+        Practice counts, Elo ratings and session counts are fetched once for
+        the whole goal set rather than per goal.
+        """
+        if not goals:
+            return
+        
+        student_id = goals[0].student_id
+        subject_ids = {goal.subject_id for goal in goals if goal.subject_id}
+        
         try:
-            # Get practice completion stats for this goal
-            practice_stats = self._get_practice_stats(goal)
-            
-            # Get Elo rating progress
-            elo_progress = self._get_elo_progress(goal)
-            
-            # Get session progress
-            session_progress = self._get_session_progress(goal)
-            
-            # Calculate weighted progress
-            # Practice: 60%, Elo: 30%, Sessions: 10%
-            total_progress = (
-                practice_stats * 0.60 +
-                elo_progress * 0.30 +
-                session_progress * 0.10
-            )
-            
-            # Clamp to 0-100
-            total_progress = max(0.0, min(100.0, total_progress))
+            practice_counts = self._get_practice_counts(student_id, goals)
+            ratings = self._get_ratings_by_subject(student_id, subject_ids)
+            session_counts = self._get_session_counts_by_subject(student_id, subject_ids)
             
-            # Update goal
-            old_completion = float(goal.completion_percentage)
-            goal.completion_percentage = total_progress
+            progress_by_goal = {}
+            completed_goal_ids = []
+            for goal in goals:
+                total_progress = self._calculate_goal_progress(goal, practice_counts, ratings, session_counts)
+                progress_by_goal[goal.id] = total_progress
+                
+                # Auto-complete goal if progress reaches 100%
+                if total_progress >= 100.0 and goal.status == "active":
+                    completed_goal_ids.append(goal.id)
+                    logger.info(f"Goal {goal.id} auto-completed at 100% progress")
+                
+                logger.debug(
+                    f"Updated goal {goal.id} progress: "
+                    f"{float(goal.completion_percentage):.1f}% -> {total_progress:.1f}%"
+                )
             
-            # Auto-complete goal if progress reaches 100%
-            if total_progress >= 100.0 and goal.status == "active":
-                goal.status = "completed"
-                goal.completed_at = datetime.now(timezone.utc)
-                logger.info(f"Goal {goal.id} auto-completed at 100% progress")
+            self._save_goal_progress(progress_by_goal, completed_goal_ids)
             
+            # Single commit for the whole goal set
             self.db.commit()
-            
-            logger.debug(
-                f"Updated goal {goal.id} progress: {old_completion:.1f}% -> {total_progress:.1f}%"
-            )
-            
         except Exception as e:
-            logger.error(f"Error updating goal progress for goal {goal.id}: {e}", exc_info=True)
+            logger.error(f"Error updating goal progress for student {student_id}: {e}", exc_info=True)
             self.db.rollback()
     
-    def _get_practice_stats(self, goal: Goal) -> float:
+    def _save_goal_progress(self, progress_by_goal: Dict, completed_goal_ids: List) -> None:
         """
-        Calculate practice completion percentage (0-100)
+        Write completion_percentage (and auto-completion) for all goals in one UPDATE
         
-        Based on:
-        - Number of completed practice items linked to this goal
-        - Target: Assume 50 completed items = 100% (configurable)
+        The loaded Goal objects are not synchronized; the caller's commit
+        expires them, so they reload on next access.
         """
-        from sqlalchemy.dialects.postgresql import array
-        
-        # Get practice items linked to this goal
-        goal_id_str = str(goal.id)
+        values = {
+            "completion_percentage": case(progress_by_goal, value=Goal.id)
+        }
+        if completed_goal_ids:
+            is_completed = Goal.id.in_(completed_goal_ids)
+            values["status"] = case((is_completed, "completed"), else_=Goal.status)
+            values["completed_at"] = case(
+                (is_completed, datetime.now(timezone.utc)), else_=Goal.completed_at
+            )
         
-        # Query for practice items with this goal in goal_tags
-        # PostgreSQL array contains operator
-        practice_query = self.db.query(PracticeAssignment).filter(
-            PracticeAssignment.student_id == goal.student_id,
-            PracticeAssignment.completed == True
+        self.db.execute(
+            update(Goal).where(Goal.id.in_(progress_by_goal)).values(**values)
+            .execution_options(synchronize_session=False)
         )
+    
+    def _get_practice_counts(self, student_id, goals: List[Goal]) -> Dict:
+        """
+        Map goal id -> number of completed practice items counting toward it
         
-        # Try to find items with this goal_id in goal_tags array
-        # PostgreSQL: use array overlap operator (&&) or contains operator
-        try:
-            # Method 1: Check if goal_id is in the goal_tags array
-            practice_items = practice_query.filter(
-                PracticeAssignment.goal_tags.contains([goal_id_str])
+        Items are matched by goal_tags; goals with no tagged items fall back to
+        completed items in the goal's subject.
+        """
+        goal_ids = [str(goal.id) for goal in goals]
+        
+        # goal_tags && ARRAY[goal_ids] (served by the GIN index on goal_tags),
+        # then unnest so each matching tag is counted once per item.
+        # The column uses the generic ARRAY type, which has no .overlap().
+        tagged = select(
+            func.unnest(PracticeAssignment.goal_tags).label("tag")
+        ).where(
+            PracticeAssignment.student_id == student_id,
+            PracticeAssignment.completed == True,
+            PracticeAssignment.goal_tags.op("&&")(cast(array(goal_ids), ARRAY(Text)))
+        ).subquery()
+        tag_counts = dict(self.db.execute(
+            select(tagged.c.tag, func.count()).where(
+                tagged.c.tag.in_(goal_ids)
+            ).group_by(tagged.c.tag)
+        ).all())
+        
+        counts = {goal.id: tag_counts.get(str(goal.id), 0) for goal in goals}
+        
+        # If no items found by goal_tags, count by subject_id
+        fallback_subject_ids = {
+            goal.subject_id for goal in goals
+            if not counts[goal.id] and goal.subject_id
+        }
+        if fallback_subject_ids:
+            subject_counts = dict(self.db.execute(
+                select(PracticeAssignment.subject_id, func.count()).where(
+                    PracticeAssignment.student_id == student_id,
+                    PracticeAssignment.completed == True,
+                    PracticeAssignment.subject_id.in_(fallback_subject_ids)
+                ).group_by(PracticeAssignment.subject_id)
+            ).all())
+            for goal in goals:
+                if not counts[goal.id] and goal.subject_id:
+                    counts[goal.id] = subject_counts.get(goal.subject_id, 0)
+        
+        return counts
+    
+    def _get_ratings_by_subject(self, student_id, subject_ids: set) -> Dict:
+        """Map subject_id -> current Elo rating (None if unrated) for the student"""
+        missing = {sid for sid in subject_ids if (student_id, sid) not in self._rating_cache}
+        if missing:
+            rows = self.db.execute(
+                select(StudentRating.subject_id, StudentRating.rating).where(
+                    StudentRating.student_id == student_id,
+                    StudentRating.subject_id.in_(missing)
+                )
             ).all()
-        except Exception:
-            # Fallback: If array operations don't work, try string matching
-            # This is less efficient but more compatible
-            all_items = practice_query.all()
-            practice_items = [
-                item for item in all_items
-                if item.goal_tags and goal_id_str in item.goal_tags
-            ]
-        
-        # If no items found by goal_tags, try by subject_id
-        if not practice_items and goal.subject_id:
-            practice_items = practice_query.filter(
-                PracticeAssignment.subject_id == goal.subject_id
+            found = dict(rows)
+            for sid in missing:
+                self._rating_cache[(student_id, sid)] = found.get(sid)
+        
+        return {sid: self._rating_cache[(student_id, sid)] for sid in subject_ids}
+    
+    def _get_session_counts_by_subject(self, student_id, subject_ids: set) -> Dict:
+        """Map subject_id -> number of sessions for the student"""
+        missing = {sid for sid in subject_ids if (student_id, sid) not in self._session_count_cache}
+        if missing:
+            rows = self.db.execute(
+                select(SessionModel.subject_id, func.count()).where(
+                    SessionModel.student_id == student_id,
+                    SessionModel.subject_id.in_(missing)
+                ).group_by(SessionModel.subject_id)
             ).all()
+            found = dict(rows)
+            for sid in missing:
+                self._session_count_cache[(student_id, sid)] = found.get(sid, 0)
         
-        completed_count = len(practice_items)
+        return {sid: self._session_count_cache[(student_id, sid)] for sid in subject_ids}
+    
+    def _calculate_goal_progress(
+        self,
+        goal: Goal,
+        practice_counts: Dict,
+        ratings: Dict,
+        session_counts: Dict
+    ) -> float:
+        """
+        Calculate a goal's completion percentage (0-100)
         
-        # Target: 50 completed items = 100% progress
-        # This can be adjusted based on goal_type or other factors
-        target_items = 50
-        if goal.goal_type and goal.goal_type.upper() == "SAT":
-            target_items = 100  # SAT goals require more practice
-        elif goal.goal_type and goal.goal_type.upper() == "AP":
-            target_items = 75  # AP goals require moderate practice
+        Progress is calculated based on:
+        1. Practice items completed (60% weight)
+        2. Elo rating improvement (30% weight)
+        3. Sessions completed (10% weight)
+        """
+        # Get practice completion stats for this goal
+        total_progress = self._get_practice_stats(goal, practice_counts) * PRACTICE_WEIGHT
+        
+        # Elo and session progress are per subject; goals without one score 0 on both
+        if goal.subject_id:
+            total_progress += (
+                self._get_elo_progress(goal, ratings) * ELO_WEIGHT +
+                self._get_session_progress(goal, session_counts) * SESSION_WEIGHT
+            )
+        
+        # Clamp to 0-100
+        return max(0.0, min(100.0, total_progress))
+    
+    def _get_practice_stats(self, goal: Goal, practice_counts: Dict) -> float:
+        """
+        Calculate practice completion percentage (0-100)
+        
+        Based on:
+        - Number of completed practice items linked to this goal
+        - Target: Assume 50 completed items = 100% (configurable)
+        """
+        completed_count = practice_counts.get(goal.id, 0)
+        
+        # Target: 50 completed items = 100% progress, adjusted by goal_type
+        target_items = DEFAULT_TARGET_ITEMS
+        if goal.goal_type:
+            target_items = TARGET_ITEMS_BY_GOAL_TYPE.get(goal.goal_type.upper(), DEFAULT_TARGET_ITEMS)
         
         progress = min(100.0, (completed_count / target_items) * 100.0)
         
         return progress
     
-    def _get_elo_progress(self, goal: Goal) -> float:
+    def _get_elo_progress(self, goal: Goal, ratings: Dict) -> float:
         """
         Calculate progress based on Elo rating improvement (0-100)
         
@@ -222,32 +340,23 @@ class GoalProgressService:
             return 0.0
         
         # Get current Elo rating for this subject
-        rating = self.db.query(StudentRating).filter(
-            StudentRating.student_id == goal.student_id,
-            StudentRating.subject_id == goal.subject_id
-        ).first()
+        current_rating = ratings.get(goal.subject_id)
         
-        if not rating:
+        if current_rating is None:
             return 0.0
         
-        current_rating = rating.rating
-        starting_rating = 1000  # Default Elo rating
-        
-        # Calculate improvement
-        improvement = current_rating - starting_rating
-        
-        # Target: 500 point improvement (from 1000 to 1500) = 100% progress
-        target_improvement = 500
+        # Calculate improvement over the default Elo rating
+        improvement = current_rating - STARTING_RATING
         
         # Progress based on improvement
         if improvement <= 0:
             progress = 0.0
         else:
-            progress = min(100.0, (improvement / target_improvement) * 100.0)
+            progress = min(100.0, (improvement / TARGET_RATING_IMPROVEMENT) * 100.0)
         
         return progress
     
-    def _get_session_progress(self, goal: Goal) -> float:
+    def _get_session_progress(self, goal: Goal, session_counts: Dict) -> float:
         """
         Calculate progress based on sessions completed (0-100)
         
@@ -258,15 +367,9 @@ class GoalProgressService:
         if not goal.subject_id:
             return 0.0
         
-        session_count = self.db.query(func.count(SessionModel.id)).filter(
-            SessionModel.student_id == goal.student_id,
-            SessionModel.subject_id == goal.subject_id
-        ).scalar() or 0
-        
-        # Target: 10 sessions = 100% progress
-        target_sessions = 10
+        session_count = session_counts.get(goal.subject_id, 0)
         
-        progress = min(100.0, (session_count / target_sessions) * 100.0)
+        progress = min(100.0, (session_count / TARGET_SESSIONS) * 100.0)
         
         return progress
 
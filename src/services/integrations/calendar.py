@@ -5,9 +5,13 @@ Integration with Google Calendar and Outlook
 
 import logging
 from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 
+from src.services.integrations.http import (
+    HTTP_TIMEOUT, get_http_session, get_circuit_breaker, get_sync_cache, sync_cache_key
+)
+
 logger = logging.getLogger(__name__)
 
 
@@ -16,6 +20,13 @@ class CalendarService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.http = get_http_session()
+    
+    def _request(self, provider: str, method: str, url: str, **kwargs):
+        """Call a calendar provider through its circuit breaker"""
+        return get_circuit_breaker(provider).call(
+            getattr(self.http, method), url, timeout=HTTP_TIMEOUT, **kwargs
+        )
     
     def sync_google_calendar(
         self,
@@ -36,10 +47,17 @@ class CalendarService:
         Returns:
             Dict with synced events
         """
-        import requests
+        # Keyed on the requested window, so a defaulted window reuses a recent sync
+        cache = get_sync_cache()
+        key = sync_cache_key("google_calendar", access_token, calendar_id, start_date, end_date)
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            return cached_result
         
+        now = datetime.now(timezone.utc)
+        synced_at = now.isoformat()
         if not start_date:
-            start_date = datetime.utcnow()
+            start_date = now.replace(tzinfo=None)
         if not end_date:
             end_date = start_date + timedelta(days=30)
         
@@ -58,25 +76,27 @@ class CalendarService:
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request("google_calendar", "get", url, headers=headers, params=params)
             response.raise_for_status()
             data = response.json()
             
             events = data.get("items", [])
             
-            return {
+            result = {
                 "success": True,
                 "events": events,
                 "count": len(events),
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
+            cache.set(key, result)
+            return result
             
         except Exception as e:
             logger.error(f"Google Calendar API error: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
     
     def create_google_calendar_event(
@@ -104,8 +124,6 @@ class CalendarService:
         Returns:
             Created event data
         """
-        import requests
-        
         url = f"https://www.googleapis.com/calendar/v3/calendars/{calendar_id}/events"
         
         headers = {
@@ -131,14 +149,14 @@ class CalendarService:
             event_data["location"] = location
         
         try:
-            response = requests.post(url, headers=headers, json=event_data, timeout=10)
+            response = self._request("google_calendar", "post", url, headers=headers, json=event_data)
             response.raise_for_status()
             event = response.json()
             
             return {
                 "success": True,
                 "event": event,
-                "created_at": datetime.utcnow().isoformat()
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
@@ -165,10 +183,17 @@ class CalendarService:
         Returns:
             Dict with synced events
         """
-        import requests
+        # Keyed on the requested window, so a defaulted window reuses a recent sync
+        cache = get_sync_cache()
+        key = sync_cache_key("outlook_calendar", access_token, start_date, end_date)
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            return cached_result
         
+        now = datetime.now(timezone.utc)
+        synced_at = now.isoformat()
         if not start_date:
-            start_date = datetime.utcnow()
+            start_date = now.replace(tzinfo=None)
         if not end_date:
             end_date = start_date + timedelta(days=30)
         
@@ -185,25 +210,27 @@ class CalendarService:
         }
         
         try:
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self._request("outlook_calendar", "get", url, headers=headers, params=params)
             response.raise_for_status()
             data = response.json()
             
             events = data.get("value", [])
             
-            return {
+            result = {
                 "success": True,
                 "events": events,
                 "count": len(events),
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
+            cache.set(key, result)
+            return result
             
         except Exception as e:
             logger.error(f"Outlook Calendar API error: {str(e)}")
             return {
                 "success": False,
                 "error": str(e),
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
     
     def create_outlook_calendar_event(
@@ -229,8 +256,6 @@ class CalendarService:
         Returns:
             Created event data
         """
-        import requests
-        
         url = "https://graph.microsoft.com/v1.0/me/calendar/events"
         
         headers = {
@@ -261,14 +286,14 @@ class CalendarService:
             }
         
         try:
-            response = requests.post(url, headers=headers, json=event_data, timeout=10)
+            response = self._request("outlook_calendar", "post", url, headers=headers, json=event_data)
             response.raise_for_status()
             event = response.json()
             
             return {
                 "success": True,
                 "event": event,
-                "created_at": datetime.utcnow().isoformat()
+                "created_at": datetime.now(timezone.utc).isoformat()
             }
             
         except Exception as e:
@@ -0,0 +1,171 @@
+"""
+HTTP Client
+Shared, connection-pooled HTTP session for external integrations
+"""
+
+import copy
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.cache import SimpleCache, cache_key
+
+logger = logging.getLogger(__name__)
+
+# Pool sizing: connections kept per host, and hosts kept in the pool
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 20
+
+# (connect, read) timeout for provider calls, in seconds
+HTTP_TIMEOUT = (2, 5)
+
+# Consecutive provider failures that open the circuit, and how long it stays open
+BREAKER_FAIL_MAX = 5
+BREAKER_RESET_TIMEOUT = 60
+
+# How long successful sync responses are reused before calling the provider
+# again, and how many are kept
+SYNC_CACHE_TTL = 300
+SYNC_CACHE_MAX_SIZE = 1024
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+class _SyncCache(SimpleCache):
+    """Sync response cache that stores and hands out copies, so one caller's
+    changes to a result can't leak into another's"""
+    
+    def get(self, key: str) -> Optional[Any]:
+        value = super().get(key)
+        return copy.deepcopy(value) if value is not None else None
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        super().set(key, copy.deepcopy(value), ttl)
+
+
+# Sync responses are kept apart from the general query cache
+_sync_cache = _SyncCache(default_ttl=SYNC_CACHE_TTL, max_size=SYNC_CACHE_MAX_SIZE)
+
+_breakers: Dict[str, "CircuitBreaker"] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Raised instead of calling a provider whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Fail fast on a provider that keeps failing
+    
+    After fail_max consecutive failures the circuit opens and calls raise
+    CircuitOpenError without touching the network. Once reset_timeout has
+    passed, calls are let through again; a success closes the circuit and a
+    failure re-opens it.
+    
+    Only connection errors, timeouts and 5xx responses count as failures, so
+    one user's bad credentials (4xx) cannot open the circuit for everyone.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        fail_max: int = BREAKER_FAIL_MAX,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently being rejected"""
+        with self._lock:
+            return self._opened_at is not None and time.monotonic() - self._opened_at < self.reset_timeout
+    
+    def call(self, func: Callable[..., requests.Response], *args, **kwargs) -> requests.Response:
+        """Make an HTTP call through the breaker, returning its response"""
+        if self.is_open:
+            raise CircuitOpenError(f"Circuit open for {self.name}; skipping call")
+        
+        try:
+            response = func(*args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self._record_failure()
+            raise
+        
+        if response.status_code >= 500:
+            self._record_failure()
+        else:
+            self._record_success()
+        return response
+    
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.fail_max:
+                if self._opened_at is None:
+                    logger.warning(f"Opening circuit for {self.name} after {self._failures} failures")
+                self._opened_at = time.monotonic()
+    
+    def _record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+
+def _create_session() -> requests.Session:
+    """Create a requests session with keep-alive connection pooling"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """
+    Get the shared HTTP session
+    
+    Reusing one session lets TCP/TLS connections to the same provider
+    (Canvas, Google, Microsoft Graph, webhook targets) be kept alive across
+    calls and requests instead of re-handshaking every time.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def get_sync_cache() -> SimpleCache:
+    """Get the cache holding recent provider sync responses"""
+    return _sync_cache
+
+
+def sync_cache_key(provider: str, token: str, *parts) -> str:
+    """
+    Generate cache key for a provider sync response
+    
+    The credential is hashed so raw tokens are never held as cache keys.
+    """
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    return cache_key("sync", provider, token_hash, *parts)
+
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get the shared circuit breaker for a provider (e.g. "canvas")"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
@@ -5,18 +5,31 @@ Integration with Learning Management Systems (Canvas, Blackboard)
 
 import logging
 import requests
-from typing import Dict, List, Optional
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Iterator
+from datetime import datetime, timezone
+from urllib.parse import urlparse
 from sqlalchemy.orm import Session
 
+from src.services.integrations.http import (
+    HTTP_TIMEOUT, get_http_session, get_circuit_breaker, get_sync_cache, sync_cache_key
+)
+
 logger = logging.getLogger(__name__)
 
+# Max concurrent per-course assignment requests during a full Canvas sync
+CANVAS_FETCH_WORKERS = 8
+
+# Page size requested from Canvas list endpoints (Canvas defaults to 10)
+CANVAS_PAGE_SIZE = 100
+
 
 class LMSService:
     """Service for LMS integrations"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.http = get_http_session()
     
     def sync_canvas_assignments(
         self,
@@ -35,6 +48,25 @@ class LMSService:
         Returns:
             Dict with synced assignments
         """
+        cache = get_sync_cache()
+        key = sync_cache_key("canvas", api_token, canvas_url, course_id)
+        cached_result = cache.get(key)
+        if cached_result is not None:
+            return cached_result
+        
+        result = self._sync_canvas_assignments(api_token, canvas_url, course_id)
+        if result["success"]:
+            cache.set(key, result)
+        return result
+    
+    def _sync_canvas_assignments(
+        self,
+        api_token: str,
+        canvas_url: str,
+        course_id: Optional[str]
+    ) -> Dict:
+        """Fetch assignments from Canvas, bypassing the sync cache"""
+        synced_at = datetime.now(timezone.utc).isoformat()
         headers = {
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
@@ -47,32 +79,30 @@ class LMSService:
             else:
                 # Get all courses, then assignments
                 courses_url = f"{canvas_url}/api/v1/courses"
-                courses_response = requests.get(courses_url, headers=headers, timeout=10)
-                courses_response.raise_for_status()
-                courses = courses_response.json()
+                courses = list(self._iter_canvas_pages(canvas_url, courses_url, headers))
                 
+                # Fetch each course's assignments concurrently (results keep course order)
                 all_assignments = []
-                for course in courses:
-                    assignments_url = f"{canvas_url}/api/v1/courses/{course['id']}/assignments"
-                    assignments_response = requests.get(assignments_url, headers=headers, timeout=10)
-                    assignments_response.raise_for_status()
-                    assignments = assignments_response.json()
-                    all_assignments.extend(assignments)
+                if courses:
+                    with ThreadPoolExecutor(max_workers=min(CANVAS_FETCH_WORKERS, len(courses))) as executor:
+                        for assignments in executor.map(
+                            lambda course: self._fetch_canvas_course_assignments(canvas_url, course["id"], headers),
+                            courses
+                        ):
+                            all_assignments.extend(assignments)
                 
                 return {
                     "success": True,
                     "assignments": all_assignments,
-                    "synced_at": datetime.utcnow().isoformat()
+                    "synced_at": synced_at
                 }
             
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            assignments = response.json()
+            assignments = list(self._iter_canvas_pages(canvas_url, url, headers))
             
             return {
                 "success": True,
                 "assignments": assignments,
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
             
         except requests.exceptions.RequestException as e:
@@ -80,9 +110,42 @@ class LMSService:
             return {
                 "success": False,
                 "error": "Failed to sync assignments with Canvas LMS. Please try again later.",
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
     
+    def _fetch_canvas_course_assignments(self, canvas_url: str, course_id, headers: Dict) -> List[Dict]:
+        """Fetch assignments for a single Canvas course"""
+        assignments_url = f"{canvas_url}/api/v1/courses/{course_id}/assignments"
+        return list(self._iter_canvas_pages(canvas_url, assignments_url, headers))
+    
+    def _canvas_request(self, canvas_url: str, method: str, url: str, **kwargs):
+        """
+        Call the Canvas API through its circuit breaker
+        
+        Each school runs its own Canvas instance, so breakers are kept per
+        host; one instance being down does not stop syncs for the others.
+        """
+        return get_circuit_breaker(f"canvas:{urlparse(canvas_url).netloc}").call(
+            getattr(self.http, method), url, timeout=HTTP_TIMEOUT, **kwargs
+        )
+    
+    def _iter_canvas_pages(self, canvas_url: str, url: str, headers: Dict) -> Iterator[Dict]:
+        """
+        Yield items from a paginated Canvas list endpoint
+        
+        Follows the rel="next" Link header one page at a time, so callers can
+        consume items without waiting for (or holding) every page.
+        """
+        params = {"per_page": CANVAS_PAGE_SIZE}
+        while url:
+            response = self._canvas_request(canvas_url, "get", url, headers=headers, params=params)
+            response.raise_for_status()
+            yield from response.json()
+            
+            # The next-page URL already carries the query string
+            url = response.links.get("next", {}).get("url")
+            params = None
+    
     def sync_blackboard_assignments(
         self,
         api_key: str,
@@ -102,6 +165,8 @@ class LMSService:
         Returns:
             Dict with synced assignments
         """
+        synced_at = datetime.now(timezone.utc).isoformat()
+        
         # Blackboard uses OAuth2
         # This is a simplified implementation
         try:
@@ -111,14 +176,14 @@ class LMSService:
                 "success": True,
                 "assignments": [],
                 "message": "Blackboard integration requires OAuth2 setup",
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
         except Exception as e:
             logger.error(f"Blackboard API error: {str(e)}")
             return {
                 "success": False,
                 "error": "Failed to sync assignments with Blackboard LMS. Please try again later.",
-                "synced_at": datetime.utcnow().isoformat()
+                "synced_at": synced_at
             }
     
     def submit_grade(
@@ -185,12 +250,12 @@ class LMSService:
             }
         
         try:
-            response = requests.put(url, headers=headers, json=data, timeout=10)
+            response = self._canvas_request(canvas_url, "put", url, headers=headers, json=data)
             response.raise_for_status()
             
             return {
                 "success": True,
-                "submitted_at": datetime.utcnow().isoformat()
+                "submitted_at": datetime.now(timezone.utc).isoformat()
             }
         except requests.exceptions.RequestException as e:
             logger.error(f"Canvas grade submission error: {str(e)}")
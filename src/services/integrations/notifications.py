@@ -4,12 +4,16 @@ Push notifications for mobile and web
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+# Max notifications in flight at once during a batch send
+NOTIFICATION_BATCH_WORKERS = 16
+
 
 class NotificationService:
     """Service for push notifications"""
@@ -54,7 +58,7 @@ class NotificationService:
         return {
             "success": True,
             "message": "Push notification queued",
-            "sent_at": datetime.utcnow().isoformat(),
+            "sent_at": datetime.now(timezone.utc).isoformat(),
             "note": "In production, this would send via FCM/APNs/Web Push"
         }
     
@@ -73,15 +77,12 @@ class NotificationService:
         """
         results = []
         
-        for notification in notifications:
-            result = self.send_push_notification(
-                user_id=notification.get("user_id"),
-                title=notification.get("title"),
-                body=notification.get("body"),
-                data=notification.get("data"),
-                platform=notification.get("platform")
-            )
-            results.append(result)
+        # Each send is an independent network call once wired to FCM/APNs/Web
+        # Push, so keep a bounded number in flight; results keep input order
+        if notifications:
+            workers = min(NOTIFICATION_BATCH_WORKERS, len(notifications))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(self._send_batch_item, notifications))
         
         success_count = sum(1 for r in results if r.get("success"))
         
@@ -93,6 +94,23 @@ class NotificationService:
             "results": results
         }
     
+    def _send_batch_item(self, notification: Dict) -> Dict:
+        """Send one batch notification, reporting failure instead of raising"""
+        try:
+            return self.send_push_notification(
+                user_id=notification.get("user_id"),
+                title=notification.get("title"),
+                body=notification.get("body"),
+                data=notification.get("data"),
+                platform=notification.get("platform")
+            )
+        except Exception as e:
+            logger.error(f"Failed to send notification to user {notification.get('user_id')}: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
     def register_device_token(
         self,
         user_id: str,
@@ -117,7 +135,7 @@ class NotificationService:
         
         return {
             "success": True,
-            "registered_at": datetime.utcnow().isoformat()
+            "registered_at": datetime.now(timezone.utc).isoformat()
         }
     
     def unregister_device_token(
@@ -139,6 +157,6 @@ class NotificationService:
         
         return {
             "success": True,
-            "unregistered_at": datetime.utcnow().isoformat()
+            "unregistered_at": datetime.now(timezone.utc).isoformat()
         }
 
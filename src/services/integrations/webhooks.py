@@ -3,15 +3,26 @@ Webhook Service
 Webhook delivery and management
 """
 
+import asyncio
 import logging
 import hmac
 import hashlib
 import json
-import requests
-from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from datetime import datetime, timedelta
+from functools import lru_cache
+from uuid import UUID
 from sqlalchemy.orm import Session
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+from src.services.integrations.http import HTTP_TIMEOUT, get_http_session
+from src.utils.cache import SimpleCache
+
 # Import models - will use test models if available
 try:
     from tests.test_models import TestWebhook, TestWebhookEvent
@@ -20,14 +31,112 @@ except ImportError:
     USE_TEST_MODELS = False
     from src.models.integration import Webhook, WebhookEvent
 
+# Bound once here so methods don't re-select the model classes per call
+_WEBHOOK_MODEL = TestWebhook if USE_TEST_MODELS else Webhook
+_EVENT_MODEL = TestWebhookEvent if USE_TEST_MODELS else WebhookEvent
+
 logger = logging.getLogger(__name__)
 
+# Max concurrent deliveries when an event fans out to several webhooks
+WEBHOOK_DELIVERY_WORKERS = 16
+
+# Failed deliveries are retried after min(RETRY_BASE_DELAY * 2**attempts,
+# RETRY_MAX_DELAY) seconds, up to WEBHOOK_MAX_ATTEMPTS attempts in total
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 3600
+WEBHOOK_MAX_ATTEMPTS = 10
+
+# Seconds between sweeps for due retries, and events redelivered per sweep
+WEBHOOK_RETRY_INTERVAL = 30
+WEBHOOK_RETRY_BATCH = 100
+
+# Bytes of a subscriber's response body kept on the event record
+RESPONSE_BODY_LIMIT = 1000
+
+# How long the active-subscription list is reused before re-reading webhooks
+SUBSCRIPTION_CACHE_TTL = 30
+
+_subscription_cache = SimpleCache(default_ttl=SUBSCRIPTION_CACHE_TTL)
+_SUBSCRIPTIONS_KEY = "webhooks:active_subscriptions"
+
+# Shared pool for fire-and-forget deliveries (threads start on first use)
+BACKGROUND_DELIVERY_WORKERS = 8
+_background_deliveries = ThreadPoolExecutor(
+    max_workers=BACKGROUND_DELIVERY_WORKERS,
+    thread_name_prefix="webhook-delivery"
+)
+
+
+class _DeliveryResponse(NamedTuple):
+    """Status and (truncated) body of a subscriber's reply"""
+    status_code: int
+    body: str
+
+
+def invalidate_subscription_cache() -> None:
+    """Drop cached webhook subscriptions (call after adding or changing webhooks)"""
+    _subscription_cache.delete(_SUBSCRIPTIONS_KEY)
+
+
+@lru_cache(maxsize=1024)
+def _as_uuid(value):
+    """Parse a UUID string (UUIDs and unparseable values pass through unchanged)"""
+    if isinstance(value, str):
+        try:
+            return UUID(value)
+        except ValueError:
+            return value
+    return value
+
+
+@lru_cache(maxsize=1024)
+def _normalize_id(value) -> str:
+    """Canonical string form of a UUID (or UUID string) for comparison"""
+    return str(_as_uuid(value))
+
+
+def _retry_due_webhooks_once() -> Dict:
+    """Redeliver due webhook events in a session of their own"""
+    from src.config.database import get_db_session
+    
+    with get_db_session() as db:
+        return WebhookService(db).retry_due_webhooks()
+
+
+async def run_webhook_retry_loop(interval: float = WEBHOOK_RETRY_INTERVAL) -> None:
+    """
+    Periodically redeliver failed webhook events whose retry is due
+    
+    Runs until cancelled. Backoff lives in next_retry_at rather than in a
+    sleeping thread, so waiting retries never hold a delivery worker.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            result = await asyncio.to_thread(_retry_due_webhooks_once)
+            if result["total"]:
+                logger.info(f"Retried {result['total']} webhook events ({result['successful']} delivered)")
+        except Exception as e:
+            logger.warning(f"Webhook retry sweep failed: {str(e)}")
+
+
+def _log_background_delivery(future: Future) -> None:
+    """Log the outcome of a background webhook delivery"""
+    try:
+        result = future.result()
+    except Exception as e:
+        logger.warning(f"Background webhook delivery raised: {str(e)}")
+        return
+    if not result.get("success"):
+        logger.warning(f"Background webhook delivery to {result.get('url')} failed: {result}")
+
 
 class WebhookService:
     """Service for webhook management and delivery"""
     
     def __init__(self, db: Session):
         self.db = db
+        self.http = get_http_session()
     
     def create_webhook(
         self,
@@ -49,22 +158,10 @@ class WebhookService:
         Returns:
             Created webhook
         """
-        if USE_TEST_MODELS:
-            WebhookModel = TestWebhook
-        else:
-            WebhookModel = Webhook
-        
         # Handle user_id - keep as string for test models, convert to UUID for production
-        if USE_TEST_MODELS:
-            user_uuid = user_id  # Test models use strings
-        else:
-            try:
-                from uuid import UUID as UUIDType
-                user_uuid = UUIDType(user_id) if user_id and isinstance(user_id, str) else user_id
-            except (ValueError, TypeError):
-                user_uuid = user_id
+        user_uuid = user_id if USE_TEST_MODELS else _as_uuid(user_id)
         
-        webhook = WebhookModel(
+        webhook = _WEBHOOK_MODEL(
             user_id=user_uuid,
             url=url,
             secret=secret,
@@ -75,6 +172,7 @@ class WebhookService:
         self.db.add(webhook)
         self.db.commit()
         self.db.refresh(webhook)
+        invalidate_subscription_cache()
         
         return {
             "success": True,
@@ -87,15 +185,18 @@ class WebhookService:
             }
         }
     
-    def trigger_webhook(
+    def trigger_registered_webhooks(
         self,
         event_type: str,
         payload: Dict,
-        webhook_id: Optional[str] = None,
-        user_id: Optional[str] = None
+        webhook_id: Optional[Union[str, UUID]] = None,
+        user_id: Optional[Union[str, UUID]] = None
     ) -> Dict:
         """
-        Trigger webhook for an event
+        Trigger registered webhooks for an event
+        
+        Deliveries to the matching webhooks are sent concurrently; event
+        records and webhook stats are written on the calling thread.
         
         Args:
             event_type: Event type (e.g., "practice.completed", "session.created")
@@ -106,41 +207,36 @@ class WebhookService:
         Returns:
             Trigger results
         """
-        if USE_TEST_MODELS:
-            WebhookModel = TestWebhook
-            WebhookEventModel = TestWebhookEvent
-        else:
-            WebhookModel = Webhook
-            WebhookEventModel = WebhookEvent
-        
         # Find webhooks that subscribe to this event
-        query = self.db.query(WebhookModel).filter(
-            WebhookModel.status == "active",
-            WebhookModel.events.contains([event_type])
-        )
-        
-        if webhook_id:
-            try:
-                from uuid import UUID as UUIDType
-                webhook_uuid = UUIDType(webhook_id) if isinstance(webhook_id, str) else webhook_id
-                query = query.filter(WebhookModel.id == webhook_uuid)
-            except (ValueError, TypeError):
-                query = query.filter(WebhookModel.id == webhook_id)
-        
-        if user_id:
-            try:
-                from uuid import UUID as UUIDType
-                user_uuid = UUIDType(user_id) if isinstance(user_id, str) else user_id
-                query = query.filter(WebhookModel.user_id == user_uuid)
-            except (ValueError, TypeError):
-                query = query.filter(WebhookModel.user_id == user_id)
-        
-        webhooks = query.all()
+        wanted_webhook = _normalize_id(webhook_id) if webhook_id else None
+        wanted_user = _normalize_id(user_id) if user_id else None
+        matching_ids = [
+            sub_id for sub_id, sub_key, sub_user, sub_events in self._get_active_subscriptions()
+            if event_type in sub_events
+            and (wanted_webhook is None or sub_key == wanted_webhook)
+            and (wanted_user is None or sub_user == wanted_user)
+        ]
+        
+        webhooks = []
+        if matching_ids:
+            webhooks = self.db.query(_WEBHOOK_MODEL).filter(
+                _WEBHOOK_MODEL.id.in_(matching_ids),
+                _WEBHOOK_MODEL.status == "active"
+            ).all()
         
         results = []
-        for webhook in webhooks:
-            result = self._deliver_webhook(webhook, event_type, payload)
-            results.append(result)
+        if webhooks:
+            events = [self._create_event(webhook, event_type, payload) for webhook in webhooks]
+            self.db.flush()
+            # Serialized once; every subscriber gets (and signs) the same bytes
+            body = self._serialize_payload(self._build_payload(event_type, payload))
+            
+            results = self._deliver_events([
+                (webhook, event, body) for webhook, event in zip(webhooks, events)
+            ])
+            
+            # Events and webhook stats for the whole fan-out land in one commit
+            self.db.commit()
         
         success_count = sum(1 for r in results if r.get("success"))
         
@@ -152,62 +248,151 @@ class WebhookService:
             "results": results
         }
     
-    def _deliver_webhook(
-        self,
-        webhook,
-        event_type: str,
-        payload: Dict
-    ) -> Dict:
-        """Deliver webhook to URL"""
-        if USE_TEST_MODELS:
-            WebhookEventModel = TestWebhookEvent
+    def _get_active_subscriptions(self) -> List[Tuple]:
+        """
+        Get (webhook_id, normalized webhook_id, normalized user_id, events)
+        for every active webhook
+        
+        Cached for SUBSCRIPTION_CACHE_TTL seconds and cleared when a webhook is
+        created, so most events are matched without touching the database.
+        Ids are normalized here once rather than on every trigger.
+        """
+        subscriptions = _subscription_cache.get(_SUBSCRIPTIONS_KEY)
+        if subscriptions is None:
+            rows = self.db.query(_WEBHOOK_MODEL.id, _WEBHOOK_MODEL.user_id, _WEBHOOK_MODEL.events).filter(
+                _WEBHOOK_MODEL.status == "active"
+            ).all()
+            subscriptions = [
+                (
+                    row.id,
+                    _normalize_id(row.id),
+                    _normalize_id(row.user_id) if row.user_id else None,
+                    frozenset(row.events or [])
+                )
+                for row in rows
+            ]
+            _subscription_cache.set(_SUBSCRIPTIONS_KEY, subscriptions)
+        return subscriptions
+    
+    def _deliver_events(self, deliveries: List[Tuple]) -> List[Dict]:
+        """
+        POST each (webhook, event, body) delivery and record the outcomes
+        
+        Several deliveries are posted concurrently. Worker threads only do
+        HTTP; targets are snapshotted up front and outcomes recorded on the
+        calling thread, since the session is not thread-safe (caller commits).
+        """
+        targets = [(webhook.url, webhook.secret, body) for webhook, _, body in deliveries]
+        if len(targets) == 1:
+            outcomes = [self._post_webhook(*targets[0])]
         else:
-            WebhookEventModel = WebhookEvent
+            with ThreadPoolExecutor(max_workers=min(WEBHOOK_DELIVERY_WORKERS, len(targets))) as executor:
+                outcomes = list(executor.map(lambda target: self._post_webhook(*target), targets))
         
-        # Create webhook event record
-        event = WebhookEventModel(
+        return [
+            self._record_delivery(webhook, event, response, error)
+            for (webhook, event, _), (response, error) in zip(deliveries, outcomes)
+        ]
+    
+    def _build_payload(self, event_type: str, payload: Dict) -> Dict:
+        """Wrap event data in the webhook envelope"""
+        return {
+            "event": event_type,
+            "timestamp": datetime.utcnow().isoformat(),
+            "data": payload
+        }
+    
+    def _serialize_payload(self, webhook_payload: Dict) -> bytes:
+        """Serialize a webhook envelope to the exact request body bytes"""
+        if orjson is not None:
+            # Native bytes output; datetimes/UUIDs in event data need no encoder
+            return orjson.dumps(
+                webhook_payload,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z
+            )
+        return json.dumps(webhook_payload).encode('utf-8')
+    
+    def _create_event(self, webhook, event_type: str, payload: Dict):
+        """Add the pending webhook event record (flushed/committed by the caller)"""
+        event = _EVENT_MODEL(
             webhook_id=webhook.id,
             event_type=event_type,
             payload=payload,
-            status="pending"
+            status="pending",
+            attempts=0
         )
         self.db.add(event)
-        self.db.commit()
-        
-        # Prepare webhook payload
-        webhook_payload = {
-            "event": event_type,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": payload
-        }
+        return event
+    
+    def _post_webhook(
+        self,
+        url: str,
+        secret: Optional[str],
+        body: bytes
+    ) -> Tuple[Optional["_DeliveryResponse"], Optional[Exception]]:
+        """
+        POST a serialized webhook body, returning (response, error)
         
+        Only the first RESPONSE_BODY_LIMIT bytes of the subscriber's reply
+        are kept. Replies within the limit are read to the end so the
+        connection goes back to the pool; longer ones are cut off by closing
+        the connection. Does no database work, so it is safe to run on worker
+        threads.
+        """
         # Add signature if secret exists
         headers = {
             "Content-Type": "application/json",
             "User-Agent": "AI-Study-Companion-Webhook/1.0"
         }
         
-        if webhook.secret:
-            signature = self._generate_signature(
-                json.dumps(webhook_payload),
-                webhook.secret
-            )
+        if secret:
+            # Sign the bytes actually sent so receivers can verify the raw body
+            signature = self._generate_signature(body, secret)
             headers["X-Webhook-Signature"] = signature
         
         try:
-            response = requests.post(
-                webhook.url,
-                json=webhook_payload,
+            response = self.http.post(
+                url,
+                data=body,
                 headers=headers,
-                timeout=10
+                timeout=HTTP_TIMEOUT,
+                stream=True
             )
-            
+            try:
+                head = b""
+                for chunk in response.iter_content(RESPONSE_BODY_LIMIT):
+                    head += chunk
+                    if len(head) > RESPONSE_BODY_LIMIT:
+                        break
+            finally:
+                # Releases the connection to the pool if the body was fully
+                # read, otherwise drops it
+                response.close()
+            return _DeliveryResponse(
+                response.status_code,
+                head[:RESPONSE_BODY_LIMIT].decode("utf-8", "replace")
+            ), None
+        except Exception as e:
+            return None, e
+    
+    def _record_delivery(
+        self,
+        webhook,
+        event,
+        response: Optional["_DeliveryResponse"],
+        error: Optional[Exception]
+    ) -> Dict:
+        """Record a delivery outcome on the event and webhook stats (caller commits)"""
+        event.attempts = (event.attempts or 0) + 1
+        
+        if error is None:
             # Update event status
             event.status = "sent" if response.status_code < 400 else "failed"
             event.http_status = response.status_code
-            event.response_body = response.text[:1000]  # Limit response size
+            event.response_body = response.body
             event.sent_at = datetime.utcnow()
-            event.attempts = 1
+            # Server errors are worth retrying; other rejections are not
+            event.next_retry_at = self._next_retry_at(event.attempts) if response.status_code >= 500 else None
             
             # Update webhook stats
             webhook.last_triggered_at = datetime.utcnow()
@@ -215,9 +400,7 @@ class WebhookService:
                 webhook.success_count += 1
             else:
                 webhook.error_count += 1
-                webhook.last_error = f"HTTP {response.status_code}: {response.text[:200]}"
-            
-            self.db.commit()
+                webhook.last_error = f"HTTP {response.status_code}: {response.body[:200]}"
             
             return {
                 "success": response.status_code < 400,
@@ -225,36 +408,39 @@ class WebhookService:
                 "http_status": response.status_code,
                 "event_id": str(event.id)
             }
-            
-        except Exception as e:
-            logger.error(f"Webhook delivery error: {str(e)}")
-            
-            # Update event status
-            event.status = "failed"
-            event.response_body = "Delivery failed due to internal error"
-            event.attempts = 1
-            event.next_retry_at = datetime.utcnow() + timedelta(minutes=5)
-            
-            # Update webhook stats
-            webhook.error_count += 1
-            webhook.last_error = "Internal delivery error occurred"
-            
-            self.db.commit()
-            
-            return {
-                "success": False,
-                "webhook_id": str(webhook.id),
-                "error": "Internal webhook delivery error",
-                "event_id": str(event.id)
-            }
+        
+        logger.error(f"Webhook delivery error: {str(error)}")
+        
+        # Update event status
+        event.status = "failed"
+        event.response_body = "Delivery failed due to internal error"
+        event.next_retry_at = self._next_retry_at(event.attempts)
+        
+        # Update webhook stats
+        webhook.error_count += 1
+        webhook.last_error = "Internal delivery error occurred"
+        
+        return {
+            "success": False,
+            "webhook_id": str(webhook.id),
+            "error": "Internal webhook delivery error",
+            "event_id": str(event.id)
+        }
+    
+    def _next_retry_at(self, attempts: int) -> Optional[datetime]:
+        """When to retry after `attempts` failed attempts (None once exhausted)"""
+        if attempts >= WEBHOOK_MAX_ATTEMPTS:
+            return None
+        delay = min(RETRY_BASE_DELAY * 2 ** attempts, RETRY_MAX_DELAY)
+        return datetime.utcnow() + timedelta(seconds=delay)
     
     def trigger_webhook(
         self,
         event_type: str,
         payload: Dict,
         webhook_url: Optional[str] = None,
-        webhook_id: Optional[str] = None,
-        user_id: Optional[str] = None
+        webhook_id: Optional[Union[str, UUID]] = None,
+        user_id: Optional[Union[str, UUID]] = None
     ) -> Dict:
         """
         Trigger webhook to a specific URL (for direct webhook URLs)
@@ -272,52 +458,75 @@ class WebhookService:
         """
         # If direct webhook URL provided, send directly
         if webhook_url:
-            webhook_payload = {
-                "event": event_type,
-                "timestamp": datetime.utcnow().isoformat(),
-                "data": payload
-            }
-            
-            headers = {
-                "Content-Type": "application/json",
-                "User-Agent": "AI-Study-Companion-Webhook/1.0"
-            }
-            
-            try:
-                response = requests.post(
-                    webhook_url,
-                    json=webhook_payload,
-                    headers=headers,
-                    timeout=10
-                )
-                return {
-                    "success": response.status_code < 400,
-                    "http_status": response.status_code,
-                    "url": webhook_url
-                }
-            except Exception as e:
-                logger.error(f"Direct webhook delivery error: {str(e)}")
-                return {
-                    "success": False,
-                    "error": str(e),
-                    "url": webhook_url
-                }
+            return self._send_direct_webhook(event_type, payload, webhook_url)
         
         # Otherwise, use registered webhooks
         return self.trigger_registered_webhooks(event_type, payload, webhook_id, user_id)
     
-    def _generate_signature(self, payload: str, secret: str) -> str:
-        """Generate HMAC signature for webhook"""
-        return hmac.new(
-            secret.encode('utf-8'),
-            payload.encode('utf-8'),
-            hashlib.sha256
-        ).hexdigest()
+    def enqueue_direct_webhook(
+        self,
+        event_type: str,
+        payload: Dict,
+        webhook_url: str
+    ) -> Future:
+        """
+        Send a webhook to a direct URL in the background
+        
+        Returns immediately so callers (e.g. practice jobs) are not held up by
+        a slow subscriber. Delivery failures are logged.
+        """
+        future = _background_deliveries.submit(
+            self._send_direct_webhook, event_type, payload, webhook_url
+        )
+        future.add_done_callback(_log_background_delivery)
+        return future
     
-    def verify_signature(self, payload: str, signature: str, secret: str) -> bool:
+    def _send_direct_webhook(
+        self,
+        event_type: str,
+        payload: Dict,
+        webhook_url: str
+    ) -> Dict:
+        """Send a webhook to a direct URL (no registered webhook or event record)"""
+        body = self._serialize_payload(self._build_payload(event_type, payload))
+        
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": "AI-Study-Companion-Webhook/1.0"
+        }
+        
+        try:
+            response = self.http.post(
+                webhook_url,
+                data=body,
+                headers=headers,
+                timeout=HTTP_TIMEOUT
+            )
+            return {
+                "success": response.status_code < 400,
+                "http_status": response.status_code,
+                "url": webhook_url
+            }
+        except Exception as e:
+            logger.error(f"Direct webhook delivery error: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "url": webhook_url
+            }
+    
+    def _generate_signature(self, payload: Union[str, bytes], secret: Union[str, bytes]) -> str:
+        """Generate HMAC signature for webhook (str or already-encoded bytes)"""
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        # One-shot C implementation; no intermediate HMAC object
+        return hmac.digest(secret, payload, hashlib.sha256).hex()
+    
+    def verify_signature(self, payload: Union[str, bytes], signature: str, secret: Union[str, bytes]) -> bool:
         """Verify webhook signature"""
-        expected_signature = self._generate_signature(payload, secret)
-        return hmac.compare_digest(expected_signature, signature)
+        return hmac.compare_digest(self._generate_signature(payload, secret), signature)
     
     def get_webhook_events(
         self,
@@ -325,64 +534,55 @@ class WebhookService:
         status: Optional[str] = None,
         limit: int = 100
     ) -> Dict:
-        """Get webhook event history"""
-        if USE_TEST_MODELS:
-            WebhookEventModel = TestWebhookEvent
-        else:
-            WebhookEventModel = WebhookEvent
+        """
+        Get webhook event history
         
+        Only the summary columns are selected, and rows are streamed in
+        batches, so large payload/response_body columns are never loaded.
+        """
         # Handle webhook_id - keep as string for test models, convert to UUID for production
-        if USE_TEST_MODELS:
-            webhook_uuid = webhook_id  # Test models use strings
-        else:
-            try:
-                from uuid import UUID as UUIDType
-                webhook_uuid = UUIDType(webhook_id) if isinstance(webhook_id, str) else webhook_id
-            except (ValueError, TypeError):
-                webhook_uuid = webhook_id
-        
-        query = self.db.query(WebhookEventModel).filter(
-            WebhookEventModel.webhook_id == webhook_uuid
+        webhook_uuid = webhook_id if USE_TEST_MODELS else _as_uuid(webhook_id)
+        
+        query = self.db.query(
+            _EVENT_MODEL.id,
+            _EVENT_MODEL.event_type,
+            _EVENT_MODEL.status,
+            _EVENT_MODEL.http_status,
+            _EVENT_MODEL.attempts,
+            _EVENT_MODEL.created_at,
+            _EVENT_MODEL.sent_at
+        ).filter(
+            _EVENT_MODEL.webhook_id == webhook_uuid
         )
         
         if status:
-            query = query.filter(WebhookEventModel.status == status)
-        
-        events = query.order_by(WebhookEventModel.created_at.desc()).limit(limit).all()
+            query = query.filter(_EVENT_MODEL.status == status)
+        
+        rows = query.order_by(_EVENT_MODEL.created_at.desc()).limit(limit).yield_per(50)
+        events = [
+            {
+                "id": str(e.id),
+                "event_type": e.event_type,
+                "status": e.status,
+                "http_status": e.http_status,
+                "attempts": e.attempts,
+                "created_at": e.created_at.isoformat() if hasattr(e.created_at, 'isoformat') else str(e.created_at),
+                "sent_at": e.sent_at.isoformat() if e.sent_at and hasattr(e.sent_at, 'isoformat') else str(e.sent_at) if e.sent_at else None
+            }
+            for e in rows
+        ]
         
         return {
             "success": True,
-            "events": [
-                {
-                    "id": str(e.id),
-                    "event_type": e.event_type,
-                    "status": e.status,
-                    "http_status": e.http_status,
-                    "attempts": e.attempts,
-                    "created_at": e.created_at.isoformat() if hasattr(e.created_at, 'isoformat') else str(e.created_at),
-                    "sent_at": e.sent_at.isoformat() if e.sent_at and hasattr(e.sent_at, 'isoformat') else str(e.sent_at) if e.sent_at else None
-                }
-                for e in events
-            ],
+            "events": events,
             "total": len(events)
         }
     
     def retry_failed_webhook(self, event_id: str) -> Dict:
         """Retry a failed webhook event"""
-        if USE_TEST_MODELS:
-            WebhookEventModel = TestWebhookEvent
-            WebhookModel = TestWebhook
-        else:
-            WebhookEventModel = WebhookEvent
-            WebhookModel = Webhook
+        event_uuid = _as_uuid(event_id)
         
-        try:
-            from uuid import UUID as UUIDType
-            event_uuid = UUIDType(event_id) if isinstance(event_id, str) else event_id
-        except (ValueError, TypeError):
-            event_uuid = event_id
-        
-        event = self.db.query(WebhookEventModel).filter(WebhookEventModel.id == event_uuid).first()
+        event = self.db.query(_EVENT_MODEL).filter(_EVENT_MODEL.id == event_uuid).first()
         
         if not event:
             return {
@@ -390,7 +590,7 @@ class WebhookService:
                 "error": "Event not found"
             }
         
-        webhook = self.db.query(WebhookModel).filter(WebhookModel.id == event.webhook_id).first()
+        webhook = self.db.query(_WEBHOOK_MODEL).filter(_WEBHOOK_MODEL.id == event.webhook_id).first()
         
         if not webhook:
             return {
@@ -398,8 +598,45 @@ class WebhookService:
                 "error": "Webhook not found"
             }
         
-        # Retry delivery
-        result = self._deliver_webhook(webhook, event.event_type, event.payload)
+        # Retry delivery of the same event, counting it as another attempt
+        body = self._serialize_payload(self._build_payload(event.event_type, event.payload))
+        result = self._deliver_events([(webhook, event, body)])[0]
+        self.db.commit()
         
         return result
+    
+    def retry_due_webhooks(self, limit: int = WEBHOOK_RETRY_BATCH) -> Dict:
+        """
+        Redeliver failed webhook events whose next_retry_at has passed
+        
+        Called periodically by run_webhook_retry_loop. Rows are locked with
+        SKIP LOCKED so concurrent sweeps never redeliver the same event.
+        """
+        due = self.db.query(_EVENT_MODEL, _WEBHOOK_MODEL).join(
+            _WEBHOOK_MODEL, _WEBHOOK_MODEL.id == _EVENT_MODEL.webhook_id
+        ).filter(
+            _EVENT_MODEL.status == "failed",
+            _EVENT_MODEL.next_retry_at <= datetime.utcnow(),
+            _WEBHOOK_MODEL.status == "active"
+        ).order_by(
+            _EVENT_MODEL.next_retry_at
+        ).limit(limit).with_for_update(of=_EVENT_MODEL, skip_locked=True).all()
+        
+        results = []
+        if due:
+            results = self._deliver_events([
+                (webhook, event, self._serialize_payload(self._build_payload(event.event_type, event.payload)))
+                for event, webhook in due
+            ])
+            self.db.commit()
+        
+        success_count = sum(1 for r in results if r.get("success"))
+        
+        return {
+            "success": True,
+            "total": len(results),
+            "successful": success_count,
+            "failed": len(results) - success_count,
+            "results": results
+        }
 
@@ -4,7 +4,9 @@ Handles async practice generation in background
 """
 
 import logging
-from typing import Dict, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from uuid import UUID
 
@@ -15,13 +17,26 @@ from src.services.integrations.webhooks import WebhookService
 from src.models.practice import PracticeAssignment, PracticeBankItem
 from src.models.user import User
 from src.models.subject import Subject
-from src.services.practice.utils import generate_choices_from_answer
-from sqlalchemy import func
+from src.services.practice.utils import (
+    generate_choices_from_answer, generate_choices_from_answer_batch, question_fingerprint
+)
+from sqlalchemy import bindparam, func, select
 from datetime import datetime, timezone
 import uuid
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between progress-only commits (later updates are coalesced)
+PROGRESS_COMMIT_INTERVAL = 0.1
+
+# Concurrent AI generation calls
+AI_GENERATION_WORKERS = 8
+
+# Case-insensitive subject lookup, built once; matches idx_subjects_lower_name
+_SUBJECT_BY_NAME = select(Subject).where(
+    func.lower(Subject.name) == func.lower(bindparam("name"))
+)
+
 
 class PracticeJobService:
     """Service for async practice generation jobs"""
@@ -31,20 +46,40 @@ class PracticeJobService:
         self.generator = PracticeGenerator()
         self.adaptive_service = AdaptivePracticeService(db)
         self.webhook_service = WebhookService(db)
+        self._broadcast_failed = False
+        self._last_progress_commit = 0.0
     
-    def _broadcast_progress(self, job_id: UUID, progress: int, message: str):
-        """Helper to broadcast progress updates via WebSocket"""
+    def _broadcast(self, job_id: UUID, update: Dict):
+        """Helper to broadcast job updates via WebSocket (not critical)"""
         try:
-            from src.api.handlers.jobs import broadcast_job_update
-            import asyncio
-            asyncio.create_task(broadcast_job_update(job_id, {
-                "type": "status",
-                "status": "processing",
-                "progress_percent": progress,
-                "progress_message": message
-            }))
-        except:
-            pass  # WebSocket not critical
+            from src.api.handlers.jobs import publish_job_update
+            publish_job_update(job_id, update)
+        except Exception as e:
+            if not self._broadcast_failed:
+                logger.warning(f"WebSocket broadcast unavailable: {str(e)}")
+                self._broadcast_failed = True
+    
+    def _report_progress(self, job: Job, progress: int, message: str):
+        """
+        Record and broadcast job progress
+        
+        Progress commits closer together than PROGRESS_COMMIT_INTERVAL are
+        coalesced; the next commit (or job completion) persists them.
+        """
+        job.progress_percent = progress
+        job.progress_message = message
+        
+        now = time.monotonic()
+        if now - self._last_progress_commit >= PROGRESS_COMMIT_INTERVAL:
+            self.db.commit()
+            self._last_progress_commit = now
+        
+        self._broadcast(job.id, {
+            "type": "status",
+            "status": "processing",
+            "progress_percent": progress,
+            "progress_message": message
+        })
     
     def create_job(
         self,
@@ -95,22 +130,7 @@ class PracticeJobService:
         try:
             # Update status to processing
             job.status = JobStatus.PROCESSING.value
-            job.progress_percent = 0
-            job.progress_message = "Starting practice generation..."
-            self.db.commit()
-            
-            # Broadcast status update
-            try:
-                from src.api.handlers.jobs import broadcast_job_update
-                import asyncio
-                asyncio.create_task(broadcast_job_update(job.id, {
-                    "type": "status",
-                    "status": "processing",
-                    "progress_percent": 0,
-                    "progress_message": "Starting practice generation..."
-                }))
-            except:
-                pass  # WebSocket not critical
+            self._report_progress(job, 0, "Starting practice generation...")
             
             params = job.parameters
             student_id = params["student_id"]
@@ -120,9 +140,7 @@ class PracticeJobService:
             goal_tags = params.get("goal_tags", [])
             
             # Get subject
-            subject_obj = self.db.query(Subject).filter(
-                func.lower(Subject.name) == func.lower(subject)
-            ).first()
+            subject_obj = self.db.execute(_SUBJECT_BY_NAME, {"name": subject}).scalars().first()
             
             if not subject_obj:
                 raise ValueError(f"Subject '{subject}' not found")
@@ -133,59 +151,46 @@ class PracticeJobService:
                 raise ValueError("Student not found")
             
             # Get student rating
-            job.progress_percent = 10
-            job.progress_message = "Calculating difficulty level..."
-            self.db.commit()
-            self._broadcast_progress(job.id, 10, "Calculating difficulty level...")
+            self._report_progress(job, 10, "Calculating difficulty level...")
             
             student_rating = self.adaptive_service.get_student_rating(student_id, str(subject_obj.id))
             difficulty_min, difficulty_max = self.adaptive_service.select_difficulty_range(student_rating)
             
             # Get previous assignments
-            job.progress_percent = 20
-            job.progress_message = "Checking previous assignments..."
-            self.db.commit()
-            self._broadcast_progress(job.id, 20, "Checking previous assignments...")
+            self._report_progress(job, 20, "Checking previous assignments...")
             
+            # One round-trip: previous assignments with their bank item's question text
             previous_assignments = self.db.query(
                 PracticeAssignment.bank_item_id,
-                PracticeAssignment.ai_question_text
+                PracticeAssignment.ai_question_text,
+                PracticeBankItem.question_text
+            ).outerjoin(
+                PracticeBankItem, PracticeAssignment.bank_item_id == PracticeBankItem.id
             ).filter(
                 PracticeAssignment.student_id == student_id
             ).all()
             
             excluded_bank_item_ids = set()
-            excluded_question_texts = set()
-            bank_item_ids_to_fetch = set()
+            excluded_question_fps = set()
             
             for prev_assignment in previous_assignments:
                 if prev_assignment.bank_item_id:
                     excluded_bank_item_ids.add(prev_assignment.bank_item_id)
-                    bank_item_ids_to_fetch.add(prev_assignment.bank_item_id)
                 if prev_assignment.ai_question_text:
-                    excluded_question_texts.add(prev_assignment.ai_question_text.strip().lower())
-            
-            if bank_item_ids_to_fetch:
-                bank_items_with_texts = self.db.query(PracticeBankItem.question_text).filter(
-                    PracticeBankItem.id.in_(bank_item_ids_to_fetch),
-                    PracticeBankItem.question_text.isnot(None)
-                ).all()
-                for bank_item in bank_items_with_texts:
-                    if bank_item.question_text:
-                        excluded_question_texts.add(bank_item.question_text.strip().lower())
+                    excluded_question_fps.add(question_fingerprint(prev_assignment.ai_question_text))
+                if prev_assignment.question_text:
+                    excluded_question_fps.add(question_fingerprint(prev_assignment.question_text))
             
             # Find bank items
-            job.progress_percent = 30
-            job.progress_message = "Finding practice questions..."
-            self.db.commit()
-            self._broadcast_progress(job.id, 30, "Finding practice questions...")
+            self._report_progress(job, 30, "Finding practice questions...")
             
             bank_items = self.adaptive_service.find_bank_items(
                 subject_id=str(subject_obj.id),
                 difficulty_min=difficulty_min,
                 difficulty_max=difficulty_max,
                 goal_tags=goal_tags,
-                limit=num_items * 3
+                limit=num_items * 3,
+                exclude_ids=excluded_bank_item_ids
             )
             
             if len(bank_items) == 0:
@@ -197,54 +202,57 @@ class PracticeJobService:
                     difficulty_min=expanded_min,
                     difficulty_max=expanded_max,
                     goal_tags=None,
-                    limit=num_items * 3
+                    limit=num_items * 3,
+                    exclude_ids=excluded_bank_item_ids
                 )
             
             items = []
+            # Assignment rows are inserted together once selection is done
+            assignment_rows: List[Dict] = []
             assignment_id = uuid.uuid4()
             used_bank_item_ids = set(excluded_bank_item_ids)
-            used_question_texts = set(excluded_question_texts)
+            used_question_fps = set(excluded_question_fps)
             
             # Use bank items first
-            job.progress_percent = 40
-            job.progress_message = "Selecting practice questions..."
-            self.db.commit()
-            self._broadcast_progress(job.id, 40, "Selecting practice questions...")
+            self._report_progress(job, 40, "Selecting practice questions...")
             
+            selected_bank_items = []
             for bank_item in bank_items:
-                if len(items) >= num_items:
+                if len(selected_bank_items) >= num_items:
                     break
+                question_fp = question_fingerprint(bank_item.question_text) if bank_item.question_text else None
+                # The used_* sets start as copies of the excluded_* sets, so they cover both
                 if bank_item.id in used_bank_item_ids:
                     continue
-                if bank_item.question_text and bank_item.question_text.strip().lower() in used_question_texts:
-                    continue
-                if bank_item.id in excluded_bank_item_ids:
-                    continue
-                if bank_item.question_text and bank_item.question_text.strip().lower() in excluded_question_texts:
+                if question_fp is not None and question_fp in used_question_fps:
                     continue
                 
-                assignment = PracticeAssignment(
-                    id=uuid.uuid4(),
-                    student_id=UUID(student_id),
-                    source="bank",
-                    bank_item_id=bank_item.id,
-                    subject_id=subject_obj.id,
-                    difficulty_level=bank_item.difficulty_level,
-                    goal_tags=goal_tags or [],
-                    student_rating_before=student_rating,
-                    assigned_at=datetime.now(timezone.utc),
-                    created_at=datetime.now(timezone.utc)
-                )
-                self.db.add(assignment)
+                item_id = uuid.uuid4()
+                assignment_rows.append({
+                    "id": item_id,
+                    "student_id": UUID(student_id),
+                    "source": "bank",
+                    "bank_item_id": bank_item.id,
+                    "subject_id": subject_obj.id,
+                    "difficulty_level": bank_item.difficulty_level,
+                    "goal_tags": goal_tags or [],
+                    "student_rating_before": student_rating,
+                    "assigned_at": datetime.now(timezone.utc),
+                    "created_at": datetime.now(timezone.utc)
+                })
                 
                 used_bank_item_ids.add(bank_item.id)
-                if bank_item.question_text:
-                    used_question_texts.add(bank_item.question_text.strip().lower())
-                
-                choices, correct_answer = generate_choices_from_answer(bank_item.answer_text)
-                
+                if question_fp is not None:
+                    used_question_fps.add(question_fp)
+                selected_bank_items.append((item_id, bank_item))
+            
+            # Choices for all selected bank items are generated in one batch
+            choice_sets = generate_choices_from_answer_batch(
+                [bank_item.answer_text for _, bank_item in selected_bank_items]
+            )
+            for (item_id, bank_item), (choices, correct_answer) in zip(selected_bank_items, choice_sets):
                 items.append({
-                    "item_id": str(assignment.id),
+                    "item_id": str(item_id),
                     "source": "bank",
                     "question": bank_item.question_text,
                     "answer": bank_item.answer_text,
@@ -259,80 +267,98 @@ class PracticeJobService:
             # Generate AI items if needed
             needed = num_items - len(items)
             if needed > 0:
-                job.progress_percent = 50
-                job.progress_message = f"Generating {needed} AI practice questions..."
-                self.db.commit()
-                self._broadcast_progress(job.id, 50, f"Generating {needed} AI practice questions...")
+                self._report_progress(job, 50, f"Generating {needed} AI practice questions...")
                 
                 max_attempts_per_item = 5
                 attempts = 0
                 items_generated = 0
                 
-                while len(items) < num_items and attempts < needed * max_attempts_per_item:
-                    attempts += 1
-                    progress = 50 + int((items_generated / needed) * 40)
-                    job.progress_percent = progress
-                    job.progress_message = f"Generating AI question {items_generated + 1} of {needed}..."
-                    self.db.commit()
-                    
-                    ai_item_data = self.generator.generate_practice_item(
-                        subject=subject,
-                        topic=topic or subject,
-                        difficulty_level=(difficulty_min + difficulty_max) // 2,
-                        goal_tags=goal_tags
-                    )
-                    
-                    question_text = ai_item_data.get("question_text", "").strip().lower()
-                    if question_text in used_question_texts or question_text in excluded_question_texts:
-                        continue
-                    
-                    assignment = PracticeAssignment(
-                        id=uuid.uuid4(),
-                        student_id=UUID(student_id),
-                        source="ai_generated",
-                        ai_question_text=ai_item_data["question_text"],
-                        ai_answer_text=ai_item_data["answer_text"],
-                        ai_explanation=ai_item_data["explanation"],
-                        flagged=True,
-                        subject_id=subject_obj.id,
-                        difficulty_level=(difficulty_min + difficulty_max) // 2,
-                        goal_tags=goal_tags or [],
-                        student_rating_before=student_rating,
-                        assigned_at=datetime.now(timezone.utc),
-                        created_at=datetime.now(timezone.utc)
-                    )
-                    self.db.add(assignment)
-                    
-                    used_question_texts.add(question_text)
-                    
-                    choices = ai_item_data.get("choices", [])
-                    correct_answer = ai_item_data.get("correct_answer", "A")
-                    if not choices or len(choices) < 4:
-                        choices, correct_answer = generate_choices_from_answer(ai_item_data["answer_text"])
-                    
-                    items.append({
-                        "item_id": str(assignment.id),
-                        "source": "ai_generated",
-                        "flagged": True,
-                        "question": ai_item_data["question_text"],
-                        "answer": ai_item_data["answer_text"],
-                        "choices": choices,
-                        "correct_answer": correct_answer,
-                        "explanation": ai_item_data["explanation"],
-                        "difficulty": (difficulty_min + difficulty_max) // 2,
-                        "subject": subject,
-                        "goal_tags": goal_tags or [],
-                        "requires_tutor_review": True,
-                        "note": "AI-generated item - flagged for tutor review"
-                    })
-                    
-                    items_generated += 1
+                # Generation calls are slow, billed API round-trips, so each round
+                # issues exactly the remaining shortfall concurrently; duplicates
+                # are made up in a further round rather than by extra calls up front
+                executor = ThreadPoolExecutor(max_workers=AI_GENERATION_WORKERS)
+                try:
+                    while len(items) < num_items and attempts < needed * max_attempts_per_item:
+                        batch_size = min(
+                            num_items - len(items),
+                            needed * max_attempts_per_item - attempts
+                        )
+                        attempts += batch_size
+                        futures = [
+                            executor.submit(
+                                self.generator.generate_practice_item,
+                                subject=subject,
+                                topic=topic or subject,
+                                difficulty_level=(difficulty_min + difficulty_max) // 2,
+                                goal_tags=goal_tags
+                            )
+                            for _ in range(batch_size)
+                        ]
+                        
+                        for future in as_completed(futures):
+                            if len(items) >= num_items:
+                                break
+                            ai_item_data = future.result()
+                            
+                            question_fp = question_fingerprint(ai_item_data.get("question_text", ""))
+                            if question_fp in used_question_fps:
+                                continue
+                            
+                            item_id = uuid.uuid4()
+                            assignment_rows.append({
+                                "id": item_id,
+                                "student_id": UUID(student_id),
+                                "source": "ai_generated",
+                                "ai_question_text": ai_item_data["question_text"],
+                                "ai_answer_text": ai_item_data["answer_text"],
+                                "ai_explanation": ai_item_data["explanation"],
+                                "flagged": True,
+                                "subject_id": subject_obj.id,
+                                "difficulty_level": (difficulty_min + difficulty_max) // 2,
+                                "goal_tags": goal_tags or [],
+                                "student_rating_before": student_rating,
+                                "assigned_at": datetime.now(timezone.utc),
+                                "created_at": datetime.now(timezone.utc)
+                            })
+                            
+                            used_question_fps.add(question_fp)
+                            
+                            choices = ai_item_data.get("choices", [])
+                            correct_answer = ai_item_data.get("correct_answer", "A")
+                            if not choices or len(choices) < 4:
+                                choices, correct_answer = generate_choices_from_answer(ai_item_data["answer_text"])
+                            
+                            items.append({
+                                "item_id": str(item_id),
+                                "source": "ai_generated",
+                                "flagged": True,
+                                "question": ai_item_data["question_text"],
+                                "answer": ai_item_data["answer_text"],
+                                "choices": choices,
+                                "correct_answer": correct_answer,
+                                "explanation": ai_item_data["explanation"],
+                                "difficulty": (difficulty_min + difficulty_max) // 2,
+                                "subject": subject,
+                                "goal_tags": goal_tags or [],
+                                "requires_tutor_review": True,
+                                "note": "AI-generated item - flagged for tutor review"
+                            })
+                            
+                            items_generated += 1
+                            self._report_progress(
+                                job,
+                                50 + int((items_generated / needed) * 40),
+                                f"Generated AI question {items_generated} of {needed}..."
+                            )
+                finally:
+                    # If a call failed part-way, don't wait on (or start) the rest
+                    executor.shutdown(wait=False, cancel_futures=True)
             
-            # Commit all assignments
-            job.progress_percent = 95
-            job.progress_message = "Finalizing assignment..."
-            self.db.commit()
-            self._broadcast_progress(job.id, 95, "Finalizing assignment...")
+            # One multi-row INSERT instead of a round-trip per assignment; it is
+            # committed by this progress commit or the completion commit
+            if assignment_rows:
+                self.db.bulk_insert_mappings(PracticeAssignment, assignment_rows)
+            self._report_progress(job, 95, "Finalizing assignment...")
             
             # Build result
             result = {
@@ -357,10 +383,10 @@ class PracticeJobService:
             job.result = result
             self.db.commit()
             
-            # Trigger webhook if provided
+            # Trigger webhook if provided (delivered in the background)
             if job.webhook_url:
                 try:
-                    self.webhook_service.trigger_webhook(
+                    self.webhook_service.enqueue_direct_webhook(
                         event_type="practice.assignment.completed",
                         payload={
                             "job_id": str(job.id),
@@ -373,15 +399,10 @@ class PracticeJobService:
                     logger.warning(f"Failed to trigger webhook for job {job.id}: {str(e)}")
             
             # Broadcast to WebSocket connections
-            try:
-                from src.api.handlers.jobs import broadcast_job_update
-                import asyncio
-                asyncio.create_task(broadcast_job_update(job.id, {
-                    "type": "completed",
-                    "result": result
-                }))
-            except Exception as e:
-                logger.debug(f"WebSocket broadcast not available: {str(e)}")
+            self._broadcast(job.id, {
+                "type": "completed",
+                "result": result
+            })
             
             logger.info(f"Job {job_id} completed successfully")
             return result
@@ -393,10 +414,10 @@ class PracticeJobService:
             job.progress_message = f"Error: {str(e)}"
             self.db.commit()
             
-            # Trigger webhook for failure
+            # Trigger webhook for failure (delivered in the background)
             if job.webhook_url:
                 try:
-                    self.webhook_service.trigger_webhook(
+                    self.webhook_service.enqueue_direct_webhook(
                         event_type="practice.assignment.failed",
                         payload={
                             "job_id": str(job.id),
@@ -409,15 +430,10 @@ class PracticeJobService:
                     logger.warning(f"Failed to trigger failure webhook: {str(webhook_error)}")
             
             # Broadcast to WebSocket connections
-            try:
-                from src.api.handlers.jobs import broadcast_job_update
-                import asyncio
-                asyncio.create_task(broadcast_job_update(job.id, {
-                    "type": "failed",
-                    "error": str(e)
-                }))
-            except Exception as e:
-                logger.debug(f"WebSocket broadcast not available: {str(e)}")
+            self._broadcast(job.id, {
+                "type": "failed",
+                "error": str(e)
+            })
             
             return {"success": False, "error": str(e)}
 
@@ -3,13 +3,96 @@ Email Notification Service
 Send email notifications for various events
 """
 
+import html
 import logging
-from typing import Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+from typing import Callable, Dict, Iterable, List, Optional
 from datetime import datetime
 from sqlalchemy.orm import Session
 
+from src.config.settings import settings
+
 logger = logging.getLogger(__name__)
 
+# Email bodies are parsed once here; sends only substitute the variable parts.
+# Values substituted into HTML templates must already be HTML-escaped.
+_MESSAGE_HTML = Template("""
+        <html>
+        <body>
+            <h2>You have a new message</h2>
+            <p><strong>From:</strong> ${sender_name}</p>
+            <p><strong>Preview:</strong> ${preview}...</p>
+            ${link_block}
+        </body>
+        </html>
+        """)
+
+_MESSAGE_TEXT = Template("""
+        You have a new message
+        
+        From: ${sender_name}
+        Preview: ${preview}...
+        ${link_block}
+        """)
+
+_NUDGE_HTML = Template("""
+        <html>
+        <body>
+            <h2>Time to Study!</h2>
+            <p>${message}</p>
+            ${suggestions_block}
+            <p><a href="#">Continue Learning</a></p>
+        </body>
+        </html>
+        """)
+
+_NUDGE_TEXT = Template("""
+        Time to Study!
+        
+        ${message}
+        
+        ${suggestions_block}
+        
+        Continue Learning: [link]
+        """)
+
+_WEEKLY_HTML = Template("""
+        <html>
+        <body>
+            <h2>Your Weekly Progress</h2>
+            <p>Great work this week, ${student_name}!</p>
+            
+            <h3>This Week's Achievements</h3>
+            <ul>
+                <li><strong>${sessions_count}</strong> tutoring sessions</li>
+                <li><strong>${practice_count}</strong> practice items completed</li>
+                <li><strong>${goals_completed}</strong> goals completed</li>
+                <li>Reached <strong>Level ${level}</strong></li>
+                <li>Earned <strong>${xp_earned} XP</strong></li>
+            </ul>
+            
+            <p><a href="#">View Full Progress</a></p>
+        </body>
+        </html>
+        """)
+
+_WEEKLY_TEXT = Template("""
+        Your Weekly Progress
+        
+        Great work this week, ${student_name}!
+        
+        This Week's Achievements:
+        - ${sessions_count} tutoring sessions
+        - ${practice_count} practice items completed
+        - ${goals_completed} goals completed
+        - Reached Level ${level}
+        - Earned ${xp_earned} XP
+        
+        View Full Progress: [link]
+        """)
+
 
 class EmailService:
     """Service for sending email notifications"""
@@ -74,25 +157,19 @@ class EmailService:
             Send result
         """
         subject = f"New message from {sender_name}"
+        preview = message_preview[:200]
         
-        body_html = f"""
-        <html>
-        <body>
-            <h2>You have a new message</h2>
-            <p><strong>From:</strong> {sender_name}</p>
-            <p><strong>Preview:</strong> {message_preview[:200]}...</p>
-            {f'<p><a href="{thread_url}">View Message</a></p>' if thread_url else ''}
-        </body>
-        </html>
-        """
-        
-        body_text = f"""
-        You have a new message
+        body_html = _MESSAGE_HTML.substitute(
+            sender_name=html.escape(sender_name),
+            preview=html.escape(preview),
+            link_block=f'<p><a href="{html.escape(thread_url)}">View Message</a></p>' if thread_url else ''
+        )
         
-        From: {sender_name}
-        Preview: {message_preview[:200]}...
-        {f'View Message: {thread_url}' if thread_url else ''}
-        """
+        body_text = _MESSAGE_TEXT.substitute(
+            sender_name=sender_name,
+            preview=preview,
+            link_block=f'View Message: {thread_url}' if thread_url else ''
+        )
         
         return self.send_email(
             to_email=to_email,
@@ -124,31 +201,17 @@ class EmailService:
         
         suggestions_html = ""
         if suggestions:
-            suggestions_html = "<ul>"
-            for suggestion in suggestions:
-                suggestions_html += f"<li>{suggestion}</li>"
-            suggestions_html += "</ul>"
+            suggestions_html = "<ul>" + "".join(f"<li>{html.escape(s)}</li>" for s in suggestions) + "</ul>"
         
-        body_html = f"""
-        <html>
-        <body>
-            <h2>Time to Study!</h2>
-            <p>{message}</p>
-            {suggestions_html}
-            <p><a href="#">Continue Learning</a></p>
-        </body>
-        </html>
-        """
-        
-        body_text = f"""
-        Time to Study!
-        
-        {message}
-        
-        {chr(10).join(f'- {s}' for s in suggestions) if suggestions else ''}
+        body_html = _NUDGE_HTML.substitute(
+            message=html.escape(message),
+            suggestions_block=suggestions_html
+        )
         
-        Continue Learning: [link]
-        """
+        body_text = _NUDGE_TEXT.substitute(
+            message=message,
+            suggestions_block="\n".join(f"- {s}" for s in suggestions) if suggestions else ""
+        )
         
         return self.send_email(
             to_email=to_email,
@@ -183,40 +246,24 @@ class EmailService:
         level = progress_data.get("level", 1)
         xp_earned = progress_data.get("xp_earned", 0)
         
-        body_html = f"""
-        <html>
-        <body>
-            <h2>Your Weekly Progress</h2>
-            <p>Great work this week, {student_name}!</p>
-            
-            <h3>This Week's Achievements</h3>
-            <ul>
-                <li><strong>{sessions_count}</strong> tutoring sessions</li>
-                <li><strong>{practice_count}</strong> practice items completed</li>
-                <li><strong>{goals_completed}</strong> goals completed</li>
-                <li>Reached <strong>Level {level}</strong></li>
-                <li>Earned <strong>{xp_earned} XP</strong></li>
-            </ul>
-            
-            <p><a href="#">View Full Progress</a></p>
-        </body>
-        </html>
-        """
-        
-        body_text = f"""
-        Your Weekly Progress
-        
-        Great work this week, {student_name}!
-        
-        This Week's Achievements:
-        - {sessions_count} tutoring sessions
-        - {practice_count} practice items completed
-        - {goals_completed} goals completed
-        - Reached Level {level}
-        - Earned {xp_earned} XP
+        # progress_data comes from the caller, so every value is escaped
+        body_html = _WEEKLY_HTML.substitute(
+            student_name=html.escape(student_name),
+            sessions_count=html.escape(str(sessions_count)),
+            practice_count=html.escape(str(practice_count)),
+            goals_completed=html.escape(str(goals_completed)),
+            level=html.escape(str(level)),
+            xp_earned=html.escape(str(xp_earned))
+        )
         
-        View Full Progress: [link]
-        """
+        body_text = _WEEKLY_TEXT.substitute(
+            student_name=student_name,
+            sessions_count=sessions_count,
+            practice_count=practice_count,
+            goals_completed=goals_completed,
+            level=level,
+            xp_earned=xp_earned
+        )
         
         return self.send_email(
             to_email=to_email,
@@ -227,36 +274,63 @@ class EmailService:
     
     def send_batch_emails(
         self,
-        emails: List[Dict]
+        emails: Iterable[Dict],
+        on_result: Optional[Callable[[Dict], None]] = None
     ) -> Dict:
         """
         Send batch emails
         
+        Sends run concurrently on up to settings.ses_tps worker threads, for
+        when send_email makes a network round-trip. Only concurrency is
+        capped; sends are not paced to a per-second rate. The input is
+        consumed lazily and only a bounded window of sends is in flight, so
+        memory stays flat however many emails are passed.
+        
         Args:
-            emails: List of email dicts with to_email, subject, body_html, etc.
+            emails: Iterable of email dicts with to_email, subject, body_html, etc.
+            on_result: Optional callback given each send result, in input order
         
         Returns:
-            Batch send results
+            Batch send counts
         """
-        results = []
-        
-        for email in emails:
-            result = self.send_email(
-                to_email=email.get("to_email"),
-                subject=email.get("subject"),
-                body_html=email.get("body_html"),
-                body_text=email.get("body_text"),
-                from_email=email.get("from_email")
+        # Bound once rather than looked up per email
+        send_email = self.send_email
+        
+        def send(email: Dict) -> Dict:
+            get = email.get
+            return send_email(
+                to_email=get("to_email"),
+                subject=get("subject"),
+                body_html=get("body_html"),
+                body_text=get("body_text"),
+                from_email=get("from_email")
             )
-            results.append(result)
         
-        success_count = sum(1 for r in results if r.get("success"))
+        total = 0
+        success_count = 0
+        
+        def collect(future) -> None:
+            nonlocal success_count
+            result = future.result()
+            success_count += bool(result.get("success"))
+            if on_result:
+                on_result(result)
+        
+        in_flight = deque()
+        window = 2 * settings.ses_tps
+        with ThreadPoolExecutor(max_workers=settings.ses_tps) as executor:
+            submit = executor.submit
+            for email in emails:
+                if len(in_flight) >= window:
+                    collect(in_flight.popleft())
+                in_flight.append(submit(send, email))
+                total += 1
+            while in_flight:
+                collect(in_flight.popleft())
         
         return {
             "success": True,
-            "total": len(emails),
+            "total": total,
             "successful": success_count,
-            "failed": len(emails) - success_count,
-            "results": results
+            "failed": total - success_count
         }
-
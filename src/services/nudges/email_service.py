@@ -3,10 +3,74 @@ Email Service
 Sends nudges via AWS SES
 """
 
+import html
+import logging
+import threading
+import time
+from functools import lru_cache
+
 import boto3
-from typing import Optional
+from botocore.config import Config
 from src.config.settings import settings
 
+logger = logging.getLogger(__name__)
+
+NUDGE_SUBJECT = "Your Study Companion - Quick Update"
+
+
+class _SendRatePacer:
+    """Spread sends out so they stay within the SES sending rate"""
+    
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+    
+    def wait(self) -> None:
+        """Block until one more send fits within the rate"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot)
+            self._next_slot = start + 1 / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+_pacer = _SendRatePacer(settings.ses_tps)
+
+
+@lru_cache(maxsize=1)
+def get_ses_client():
+    """
+    Get the shared SES client
+    
+    Built once so the service model is parsed once and HTTPS connections
+    to SES are reused across sends. The connection pool is sized for
+    settings.ses_tps concurrent senders, and throttled calls are retried
+    with adaptive backoff.
+    """
+    return boto3.client(
+        'ses',
+        region_name=settings.ses_region,
+        config=Config(
+            max_pool_connections=settings.ses_tps,
+            retries={'max_attempts': 3, 'mode': 'adaptive'}
+        )
+    )
+
+
+@lru_cache(maxsize=1024)
+def _nudge_html(message: str) -> str:
+    """HTML body for a nudge message (cached; sweeps repeat the same messages)"""
+    return f"""
+        <html>
+        <body>
+            <p>{html.escape(message).replace(chr(10), '<br>')}</p>
+            <p><small>This is an automated message from your AI Study Companion.</small></p>
+        </body>
+        </html>
+        """
+
 
 def send_nudge_email(
     to_email: str,
@@ -20,40 +84,23 @@ def send_nudge_email(
         bool: True if sent successfully
     """
     try:
-        ses_client = boto3.client(
-            'ses',
-            region_name=settings.ses_region
-        )
-        
-        # Create email content
-        subject = "Your Study Companion - Quick Update"
-        body_text = message
-        body_html = f"""
-        <html>
-        <body>
-            <p>{message.replace(chr(10), '<br>')}</p>
-            <p><small>This is an automated message from your AI Study Companion.</small></p>
-        </body>
-        </html>
-        """
-        
-        # Send email
-        response = ses_client.send_email(
+        _pacer.wait()
+        get_ses_client().send_email(
             Source=settings.ses_from_email,
             Destination={'ToAddresses': [to_email]},
             Message={
-                'Subject': {'Data': subject, 'Charset': 'UTF-8'},
+                'Subject': {'Data': NUDGE_SUBJECT, 'Charset': 'UTF-8'},
                 'Body': {
-                    'Text': {'Data': body_text, 'Charset': 'UTF-8'},
-                    'Html': {'Data': body_html, 'Charset': 'UTF-8'}
+                    'Text': {'Data': message, 'Charset': 'UTF-8'},
+                    'Html': {'Data': _nudge_html(message), 'Charset': 'UTF-8'}
                 }
             }
         )
         
         return True
-        
+    
     except Exception as e:
         # Log error but don't raise (nudges are non-critical)
-        print(f"SES email error: {e}")
+        logger.error(f"SES email error for nudge {nudge_id}: {e}")
         return False
 
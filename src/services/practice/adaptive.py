@@ -3,7 +3,7 @@ Adaptive Practice Service
 Elo-based difficulty adjustment system
 """
 
-from typing import List, Optional, Tuple
+from typing import List, Optional, Set, Tuple
 from sqlalchemy.orm import Session as DBSession
 from sqlalchemy import func
 import math
@@ -148,9 +148,15 @@ class AdaptivePracticeService:
         difficulty_min: int,
         difficulty_max: int,
         goal_tags: Optional[List[str]] = None,
-        limit: int = 5
+        limit: int = 5,
+        exclude_ids: Optional[Set] = None
     ) -> List[PracticeBankItem]:
-        """Find practice bank items matching criteria"""
+        """
+        Find practice bank items matching criteria
+        
+        Items in exclude_ids (e.g. already assigned to the student) are
+        filtered out in SQL, so they do not use up the limit.
+        """
         query = self.db.query(PracticeBankItem).filter(
             PracticeBankItem.subject_id == subject_id,
             PracticeBankItem.difficulty_level >= difficulty_min,
@@ -158,6 +164,9 @@ class AdaptivePracticeService:
             PracticeBankItem.is_active == True
         )
         
+        if exclude_ids:
+            query = query.filter(PracticeBankItem.id.notin_(exclude_ids))
+        
         # Filter by goal tags if provided
         if goal_tags:
             # PostgreSQL array overlap operator
@@ -1,37 +1,54 @@
 """
 Practice utility functions
 """
+import hashlib
 import random
 from typing import List, Tuple
 
 
+def question_fingerprint(question_text: str) -> int:
+    """64-bit fingerprint of a question for duplicate checks
+    
+    Case and surrounding whitespace are ignored, matching the
+    strip().lower() comparison used for repeat detection.
+    """
+    digest = hashlib.blake2b(question_text.strip().lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+# Placeholder distractors and option letters shared by every generated question
+_DISTRACTORS = (
+    "A related but incorrect option",
+    "Another plausible but wrong answer",
+    "An incorrect alternative"
+)
+_LETTERS = ("A", "B", "C", "D")
+
+
 def generate_choices_from_answer(answer_text: str) -> Tuple[List[str], str]:
     """Generate 4 multiple choice options from an answer
     
     Returns:
         tuple: (choices list, correct_answer_letter)
     """
-    # Create distractors
-    distractors = [
-        "A related but incorrect option",
-        "Another plausible but wrong answer",
-        "An incorrect alternative"
-    ]
-    
-    # Combine correct answer with distractors and shuffle
-    all_options = [answer_text] + distractors
-    random.shuffle(all_options)
-    
-    # Format as A, B, C, D
-    letters = ["A", "B", "C", "D"]
-    choices = [f"{letter}) {option}" for letter, option in zip(letters, all_options)]
+    return generate_choices_from_answer_batch([answer_text])[0]
+
+
+def generate_choices_from_answer_batch(answer_texts: List[str]) -> List[Tuple[List[str], str]]:
+    """Generate 4 multiple choice options for each of several answers
     
-    # Find which letter has the correct answer
-    correct_letter = None
-    for i, option in enumerate(all_options):
-        if option == answer_text:
-            correct_letter = letters[i]
-            break
+    The correct answer's letter comes from where its index lands in the
+    shuffle, so no per-answer search over the options is needed.
     
-    return choices, correct_letter or "A"
-
+    Returns:
+        list of (choices list, correct_answer_letter), in input order
+    """
+    results = []
+    order = list(range(len(_LETTERS)))
+    for answer_text in answer_texts:
+        # Index 0 is the correct answer; the rest are distractors
+        options = (answer_text,) + _DISTRACTORS
+        random.shuffle(order)
+        choices = [f"{letter}) {options[index]}" for letter, index in zip(_LETTERS, order)]
+        results.append((choices, _LETTERS[order.index(0)]))
+    return results
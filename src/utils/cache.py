@@ -3,6 +3,7 @@ Caching Utilities
 Simple in-memory cache for frequent queries
 """
 
+import threading
 import time
 from typing import Optional, Any, Callable
 from functools import wraps
@@ -18,47 +19,67 @@ class SimpleCache:
     For production, consider using Redis or Memcached
     """
     
-    def __init__(self, default_ttl: int = 300):
+    def __init__(self, default_ttl: int = 300, max_size: Optional[int] = None):
         """
         Initialize cache
         
         Args:
             default_ttl: Default time-to-live in seconds (5 minutes)
+            max_size: Maximum number of entries (unbounded if None). When
+                full, expired entries are purged first, then the oldest
+                entries are evicted.
         """
         self._cache: dict[str, tuple[Any, float]] = {}
         self.default_ttl = default_ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if not expired"""
-        if key not in self._cache:
-            return None
-        
-        value, expiry = self._cache[key]
-        
-        # Check if expired
-        if time.time() > expiry:
-            del self._cache[key]
-            return None
-        
-        return value
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            
+            value, expiry = entry
+            
+            # Check if expired
+            if time.time() > expiry:
+                del self._cache[key]
+                return None
+            
+            return value
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache with TTL"""
         ttl = ttl or self.default_ttl
         expiry = time.time() + ttl
-        self._cache[key] = (value, expiry)
+        with self._lock:
+            # Re-inserting moves the key to the back of the eviction order
+            self._cache.pop(key, None)
+            if self.max_size is not None and len(self._cache) >= self.max_size:
+                self._purge_expired()
+                while len(self._cache) >= self.max_size:
+                    del self._cache[next(iter(self._cache))]
+            self._cache[key] = (value, expiry)
     
     def delete(self, key: str) -> None:
         """Delete key from cache"""
-        if key in self._cache:
-            del self._cache[key]
+        with self._lock:
+            self._cache.pop(key, None)
     
     def clear(self) -> None:
         """Clear all cache entries"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
     
     def cleanup_expired(self) -> int:
         """Remove expired entries, return count of removed items"""
+        with self._lock:
+            return self._purge_expired()
+    
+    def _purge_expired(self) -> int:
+        """Remove expired entries (caller holds the lock)"""
         now = time.time()
         expired_keys = [
             key for key, (_, expiry) in self._cache.items()
@@ -3,8 +3,11 @@ Dashboard Tests
 Tests for parent and admin dashboard functionality
 """
 
+import csv
+import json
 import pytest
 import uuid
+from io import StringIO
 from datetime import datetime, timedelta
 from src.services.analytics.aggregator import AnalyticsAggregator
 from src.services.analytics.exporter import DataExporter
@@ -54,6 +57,43 @@ def test_get_student_progress_summary(db_session: Session):
     assert summary["gamification"]["level"] == 5
 
 
+def test_student_progress_summary_recent_activity(db_session: Session):
+    """Test 30-day activity counts in the student progress summary"""
+    student = TestUser(
+        id=str(uuid.uuid4()),
+        cognito_sub="student-sub",
+        email="student@test.com",
+        role="student"
+    )
+    tutor = TestUser(
+        id=str(uuid.uuid4()),
+        cognito_sub="tutor-sub",
+        email="tutor@test.com",
+        role="tutor"
+    )
+    db_session.add_all([student, tutor])
+    db_session.commit()
+    
+    now = datetime.utcnow()
+    db_session.add_all([
+        TestPracticeAssignment(student_id=student.id, source="bank", completed=True, completed_at=now - timedelta(days=2)),
+        TestPracticeAssignment(student_id=student.id, source="bank", completed=True, completed_at=now - timedelta(days=45)),
+        TestPracticeAssignment(student_id=student.id, source="bank", completed=False),
+        TestSession(student_id=student.id, tutor_id=tutor.id, session_date=now - timedelta(days=1)),
+        TestSession(student_id=student.id, tutor_id=tutor.id, session_date=now - timedelta(days=60))
+    ])
+    db_session.commit()
+    
+    aggregator = AnalyticsAggregator(db_session)
+    summary = aggregator.get_student_progress_summary(str(student.id))
+    
+    assert summary["practice"]["total_assigned"] == 3
+    assert summary["practice"]["completed"] == 2
+    assert summary["practice"]["recent_30_days"] == 1
+    assert summary["sessions"]["total"] == 2
+    assert summary["sessions"]["recent_30_days"] == 1
+
+
 def test_get_override_analytics(db_session: Session):
     """Test override analytics aggregation"""
     tutor = TestUser(
@@ -136,6 +176,7 @@ def test_get_confidence_analytics(db_session: Session):
     assert analytics["confidence_counts"]["High"] == 1
     assert analytics["confidence_counts"]["Low"] == 1
     assert analytics["escalation_rate"] == 50.0
+    assert analytics["average_confidence_score"] == 0.6
 
 
 def test_get_nudge_analytics(db_session: Session):
@@ -176,6 +217,8 @@ def test_get_nudge_analytics(db_session: Session):
     assert analytics["total_nudges"] == 2
     assert analytics["engagement"]["opened"] == 1
     assert analytics["engagement"]["opened_rate"] == 50.0
+    assert analytics["by_type"]["inactivity"] == {"sent": 1, "opened": 1, "clicked": 0}
+    assert analytics["by_type"]["login"] == {"sent": 1, "opened": 0, "clicked": 0}
 
 
 def test_get_platform_overview(db_session: Session):
@@ -195,12 +238,27 @@ def test_get_platform_overview(db_session: Session):
     db_session.add_all([student, tutor])
     db_session.commit()
     
+    goal = TestGoal(
+        id=str(uuid.uuid4()),
+        student_id=student.id,
+        created_by=student.id,
+        goal_type="SAT",
+        title="Test Goal",
+        status="active"
+    )
+    db_session.add(goal)
+    db_session.commit()
+    
     aggregator = AnalyticsAggregator(db_session)
     overview = aggregator.get_platform_overview()
     
     assert overview["users"]["total"] == 2
     assert overview["users"]["students"] == 1
     assert overview["users"]["tutors"] == 1
+    assert overview["activity"]["total_goals"] == 1
+    assert overview["activity"]["active_goals"] == 1
+    assert overview["activity"]["total_sessions"] == 0
+    assert overview["recent_activity_7_days"]["practice_completed"] == 0
 
 
 def test_export_to_csv(db_session: Session):
@@ -218,6 +276,37 @@ def test_export_to_csv(db_session: Session):
     assert "Jane" in csv_content
 
 
+def test_export_to_csv_value_coercion(db_session: Session):
+    """Test CSV export converts None, dict/list and datetime values"""
+    data = [
+        {"name": None, "tags": ["a", "b"], "meta": {"k": "é"}, "when": datetime(2024, 1, 2, 3, 4, 5), "ok": True}
+    ]
+    
+    exporter = DataExporter()
+    csv_content = exporter.to_csv(data)
+    rows = list(csv.DictReader(StringIO(csv_content)))
+    
+    assert rows[0]["name"] == ""
+    # Same compact, non-ASCII-preserving format with or without orjson
+    assert rows[0]["tags"] == '["a","b"]'
+    assert rows[0]["meta"] == '{"k":"é"}'
+    assert rows[0]["when"] == "2024-01-02T03:04:05"
+    assert rows[0]["ok"] == "True"
+
+
+def test_export_to_csv_column_types(db_session: Session):
+    """Test CSV export of UUID, Decimal and date values"""
+    from datetime import date
+    from decimal import Decimal
+    
+    value = uuid.uuid4()
+    data = [{"id": value, "score": Decimal("0.85"), "day": date(2024, 1, 2)}]
+    
+    rows = list(csv.DictReader(StringIO(DataExporter.to_csv(data))))
+    
+    assert rows[0] == {"id": str(value), "score": "0.85", "day": "2024-01-02"}
+
+
 def test_export_to_json(db_session: Session):
     """Test JSON export functionality"""
     data = {
@@ -236,6 +325,45 @@ def test_export_to_json(db_session: Session):
     assert '"total": 2' in json_content
 
 
+def test_export_to_json_datetimes_and_int_keys(db_session: Session):
+    """Test JSON export handles datetimes and non-string keys"""
+    data = {
+        "generated_at": datetime(2024, 1, 2, 3, 4, 5),
+        "by_difficulty": {5: 1}
+    }
+    
+    exporter = DataExporter()
+    parsed = json.loads(exporter.to_json(data))
+    
+    assert parsed["generated_at"] == "2024-01-02T03:04:05"
+    assert parsed["by_difficulty"] == {"5": 1}
+
+
+def test_stream_csv_from_result(db_session: Session):
+    """Test streaming CSV export from a partitioned query result"""
+    from sqlalchemy import select
+    
+    for i in range(3):
+        db_session.add(TestUser(
+            id=str(uuid.uuid4()),
+            cognito_sub=f"student-sub-{i}",
+            email=f"student{i}@test.com",
+            role="student"
+        ))
+    db_session.commit()
+    
+    result = db_session.execute(
+        select(TestUser.email, TestUser.role).order_by(TestUser.email).execution_options(yield_per=2)
+    )
+    chunks = list(DataExporter.stream_csv(result, ["email", "role"], partition_size=2))
+    
+    assert chunks[0] == "email,role\r\n"
+    assert len(chunks) == 3
+    assert "".join(chunks).splitlines()[1:] == [
+        "student0@test.com,student", "student1@test.com,student", "student2@test.com,student"
+    ]
+
+
 def test_export_students_to_csv(db_session: Session):
     """Test student data CSV export"""
     students_data = [
@@ -409,3 +537,14 @@ def test_nudge_analytics_by_type(db_session: Session):
     assert analytics["by_type"]["login"]["sent"] == 1
     assert analytics["by_type"]["inactivity"]["opened"] == 1
 
+
+
+def test_to_uuid_or_str():
+    """Test cached ID normalization used by the aggregator"""
+    from src.services.analytics.aggregator import _to_uuid_or_str
+    
+    value = uuid.uuid4()
+    assert _to_uuid_or_str(str(value)) == value
+    assert _to_uuid_or_str(str(value)) is _to_uuid_or_str(str(value))
+    assert _to_uuid_or_str("not-a-uuid") == "not-a-uuid"
+    assert _to_uuid_or_str(value) is value
@@ -55,6 +55,24 @@ def test_nudge_notification_email(db_session: Session):
     assert result["success"] is True
 
 
+def test_notification_email_escapes_user_content(db_session: Session):
+    """Test user-supplied text is HTML-escaped in templated email bodies"""
+    service = EmailService(db_session)
+    sent = {}
+    service.send_email = lambda **kwargs: sent.update(kwargs) or {"success": True}
+    
+    service.send_message_notification(
+        to_email="student@example.com",
+        sender_name="<b>Tutor</b>",
+        message_preview="x < y & y > z"
+    )
+    
+    assert "&lt;b&gt;Tutor&lt;/b&gt;" in sent["body_html"]
+    assert "x &lt; y &amp; y &gt; z..." in sent["body_html"]
+    assert "View Message" not in sent["body_html"]
+    assert "From: <b>Tutor</b>" in sent["body_text"]
+
+
 def test_weekly_progress_email(db_session: Session):
     """Test weekly progress summary email"""
     service = EmailService(db_session)
@@ -74,6 +92,23 @@ def test_weekly_progress_email(db_session: Session):
     assert result["success"] is True
 
 
+def test_weekly_progress_email_escapes_progress_values(db_session: Session):
+    """Test caller-supplied progress values cannot inject HTML"""
+    service = EmailService(db_session)
+    sent = {}
+    service.send_email = lambda **kwargs: sent.update(kwargs) or {"success": True}
+    
+    service.send_weekly_progress_summary(
+        to_email="student@example.com",
+        student_name="John",
+        progress_data={"sessions": "<script>x</script>", "xp_earned": 500}
+    )
+    
+    assert "<script>" not in sent["body_html"]
+    assert "&lt;script&gt;x&lt;/script&gt;" in sent["body_html"]
+    assert "Earned <strong>500 XP</strong>" in sent["body_html"]
+
+
 def test_batch_emails(db_session: Session):
     """Test batch email sending"""
     service = EmailService(db_session)
@@ -98,6 +133,43 @@ def test_batch_emails(db_session: Session):
     assert result["successful"] == 2
 
 
+def test_batch_emails_streams_results(db_session: Session):
+    """Test batch sending accepts a generator and reports results in order"""
+    service = EmailService(db_session)
+    service.send_email = lambda **kwargs: {"success": kwargs["to_email"] != "bad@example.com", "to": kwargs["to_email"]}
+    
+    addresses = [f"user{i}@example.com" for i in range(40)] + ["bad@example.com"]
+    seen = []
+    result = service.send_batch_emails(
+        ({"to_email": address, "subject": "Hi"} for address in addresses),
+        on_result=seen.append
+    )
+    
+    assert result == {"success": True, "total": 41, "successful": 40, "failed": 1}
+    assert [r["to"] for r in seen] == addresses
+
+
+def test_nudge_email_uses_shared_client(monkeypatch):
+    """Test nudge emails go through the shared SES client with escaped HTML"""
+    from src.services.nudges import email_service
+    
+    sent = []
+    
+    class FakeSES:
+        def send_email(self, **kwargs):
+            sent.append(kwargs)
+    
+    monkeypatch.setattr(email_service, "get_ses_client", lambda: FakeSES())
+    monkeypatch.setattr(email_service, "_pacer", email_service._SendRatePacer(10000))
+    
+    assert email_service.send_nudge_email("a@example.com", "<b>Study</b>\nnow", "1") is True
+    assert email_service.send_nudge_email("b@example.com", "<b>Study</b>\nnow", "2") is True
+    
+    assert [kwargs["Destination"]["ToAddresses"] for kwargs in sent] == [["a@example.com"], ["b@example.com"]]
+    html_body = sent[0]["Message"]["Body"]["Html"]["Data"]
+    assert "&lt;b&gt;Study&lt;/b&gt;<br>now" in html_body
+
+
 def test_get_recent_conversation(db_session: Session):
     """Test getting recent conversation history"""
     student = TestUser(
@@ -3,10 +3,11 @@ Integration Tests
 Tests for integration services (LMS, Calendar, Notifications, Webhooks)
 """
 
+import json
 import pytest
 import uuid
 from datetime import datetime, timedelta
-from src.services.integrations.webhooks import WebhookService
+from src.services.integrations.webhooks import WebhookService, invalidate_subscription_cache
 from src.services.integrations.notifications import NotificationService
 from tests.test_models import TestUser
 from sqlalchemy.orm import Session
@@ -60,6 +61,7 @@ def test_trigger_webhook(db_session: Session):
     )
     db_session.add(webhook)
     db_session.commit()
+    invalidate_subscription_cache()
     
     service = WebhookService(db_session)
     
@@ -73,6 +75,191 @@ def test_trigger_webhook(db_session: Session):
     assert result["total_webhooks"] >= 0
 
 
+def test_trigger_registered_webhooks_fans_out(db_session: Session):
+    """Test an event is delivered to every subscribed webhook and recorded"""
+    from types import SimpleNamespace
+    from tests.test_models import TestWebhook
+    
+    user = TestUser(
+        id=str(uuid.uuid4()),
+        cognito_sub="fanout-sub",
+        email="fanout@test.com",
+        role="admin"
+    )
+    db_session.add(user)
+    for url in ("https://a.test/hook", "https://b.test/hook", "https://c.test/hook"):
+        db_session.add(TestWebhook(
+            id=str(uuid.uuid4()),
+            user_id=user.id,
+            url=url,
+            secret="s3cret" if url.startswith("https://a") else None,
+            events=["job.completed"],
+            status="active"
+        ))
+    db_session.commit()
+    invalidate_subscription_cache()
+    
+    posted = []
+    bodies = []
+    
+    def fake_post(url, **kwargs):
+        posted.append((url, kwargs["headers"]))
+        bodies.append(kwargs["data"])
+        if url.startswith("https://c"):
+            raise ConnectionError("refused")
+        return _FakeResponse({}, status_code=500 if url.startswith("https://b") else 200)
+    
+    service = WebhookService(db_session)
+    service.http = SimpleNamespace(post=fake_post)
+    result = service.trigger_registered_webhooks("job.completed", {"job_id": "1"}, user_id=user.id)
+    
+    assert result["total_webhooks"] == 3
+    assert result["successful"] == 1
+    assert result["failed"] == 2
+    assert sorted(url for url, _ in posted) == ["https://a.test/hook", "https://b.test/hook", "https://c.test/hook"]
+    signature = dict(posted)["https://a.test/hook"]["X-Webhook-Signature"]
+    assert len(set(bodies)) == 1
+    assert service.verify_signature(bodies[0], signature, "s3cret") is True
+    
+    statuses = sorted(
+        e["status"] for r in result["results"]
+        for e in service.get_webhook_events(r["webhook_id"])["events"]
+    )
+    assert statuses == ["failed", "failed", "sent"]
+    
+    # Other event types and users match nothing
+    assert service.trigger_registered_webhooks("job.failed", {})["total_webhooks"] == 0
+    assert service.trigger_registered_webhooks("job.completed", {}, user_id=str(uuid.uuid4()))["total_webhooks"] == 0
+    assert len(posted) == 3
+
+
+def test_retry_due_webhooks_backs_off_then_delivers(db_session: Session):
+    """Test failed events are redelivered once due, with exponential backoff"""
+    from types import SimpleNamespace
+    from tests.test_models import TestWebhook, TestWebhookEvent
+    from src.services.integrations.webhooks import RETRY_BASE_DELAY
+    
+    webhook = TestWebhook(
+        id=str(uuid.uuid4()),
+        url="https://retry.test/hook",
+        events=["job.completed"],
+        status="active"
+    )
+    event = TestWebhookEvent(
+        id=str(uuid.uuid4()),
+        webhook_id=webhook.id,
+        event_type="job.completed",
+        payload={"job_id": "1"},
+        status="failed",
+        attempts=1,
+        next_retry_at=datetime.utcnow() - timedelta(seconds=1)
+    )
+    db_session.add_all([webhook, event])
+    db_session.commit()
+    
+    replies = [ConnectionError("refused"), _FakeResponse({})]
+    
+    def fake_post(url, **kwargs):
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    
+    service = WebhookService(db_session)
+    service.http = SimpleNamespace(post=fake_post)
+    
+    result = service.retry_due_webhooks()
+    assert result["total"] == 1
+    assert result["failed"] == 1
+    db_session.refresh(event)
+    assert event.attempts == 2
+    delay = (event.next_retry_at.replace(tzinfo=None) - datetime.utcnow()).total_seconds()
+    assert RETRY_BASE_DELAY * 4 - 5 < delay <= RETRY_BASE_DELAY * 4
+    
+    # Nothing is due until the backoff expires
+    assert service.retry_due_webhooks()["total"] == 0
+    
+    event.next_retry_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    result = service.retry_due_webhooks()
+    assert result["successful"] == 1
+    db_session.refresh(event)
+    assert event.status == "sent"
+    assert event.attempts == 3
+    assert event.next_retry_at is None
+
+
+def test_enqueue_direct_webhook_delivers_in_background(db_session: Session):
+    """Test direct-URL webhooks are posted off the calling thread"""
+    import threading
+    from types import SimpleNamespace
+    
+    posted = []
+    
+    def fake_post(url, **kwargs):
+        posted.append((url, json.loads(kwargs["data"])["event"], threading.current_thread().name))
+        return _FakeResponse({}, status_code=204)
+    
+    service = WebhookService(db_session)
+    service.http = SimpleNamespace(post=fake_post)
+    
+    future = service.enqueue_direct_webhook("job.done", {"job_id": "1"}, "https://hook.test/done")
+    
+    assert future.result(timeout=5) == {"success": True, "http_status": 204, "url": "https://hook.test/done"}
+    assert posted[0][:2] == ("https://hook.test/done", "job.done")
+    assert posted[0][2] != threading.current_thread().name
+
+
+def test_webhook_posts_reuse_pooled_connection(db_session: Session):
+    """Test repeated webhook posts to one host share a single kept-alive connection"""
+    import threading
+    import requests
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    
+    connections = []
+    
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        
+        def setup(self):
+            connections.append(self.client_address)
+            super().setup()
+        
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            reply = b"x" * (5000 if self.path == "/large" else 10)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+        
+        def log_message(self, *args):
+            pass
+    
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    service = WebhookService(db_session)
+    service.http = requests.Session()
+    service.http.trust_env = False
+    
+    try:
+        for _ in range(5):
+            assert service._send_direct_webhook("job.done", {}, f"{base}/direct")["success"] is True
+        for _ in range(5):
+            response, error = service._post_webhook(f"{base}/hook", "secret", b"{}")
+            assert error is None and response.body == "x" * 10
+        assert len(connections) == 1
+        
+        # Replies over the limit are truncated and their connection dropped
+        response, error = service._post_webhook(f"{base}/large", None, b"{}")
+        assert error is None and len(response.body) == 1000
+    finally:
+        service.http.close()
+        server.shutdown()
+        server.server_close()
+
+
 def test_webhook_signature_generation(db_session: Session):
     """Test webhook signature generation and verification"""
     service = WebhookService(db_session)
@@ -83,8 +270,14 @@ def test_webhook_signature_generation(db_session: Session):
     signature = service._generate_signature(payload, secret)
     
     assert len(signature) == 64  # SHA256 hex length
+    assert service._generate_signature(payload.encode(), secret.encode()) == signature
     assert service.verify_signature(payload, signature, secret) is True
     assert service.verify_signature(payload, "wrong-signature", secret) is False
+    
+    # Verification depends on payload, signature and secret
+    assert service.verify_signature(payload, signature, secret) is True
+    assert service.verify_signature(payload, signature, "other-secret") is False
+    assert service.verify_signature(payload + " ", signature, secret) is False
 
 
 def test_get_webhook_events(db_session: Session):
@@ -128,6 +321,198 @@ def test_get_webhook_events(db_session: Session):
     assert len(result["events"]) >= 1
 
 
+def test_integrations_share_pooled_http_session(db_session: Session):
+    """Test LMS, calendar and webhook services reuse one pooled HTTP session"""
+    from src.services.integrations.http import get_http_session
+    from src.services.integrations.lms import LMSService
+    from src.services.integrations.calendar import CalendarService
+    
+    session = get_http_session()
+    
+    assert LMSService(db_session).http is session
+    assert CalendarService(db_session).http is session
+    assert WebhookService(db_session).http is session
+    assert session.get_adapter("https://example.com")._pool_maxsize == 20
+
+
+class _FakeResponse:
+    def __init__(self, payload, next_url=None, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+        self.links = {"next": {"url": next_url}} if next_url else {}
+    
+    def iter_content(self, chunk_size=1):
+        return iter(())
+    
+    def close(self):
+        pass
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return self._payload
+
+
+class _FakeCanvas:
+    """Minimal stand-in for the HTTP session serving Canvas endpoints"""
+    
+    def __init__(self, routes):
+        self.routes = routes
+        self.calls = []
+    
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        route = self.routes[url]
+        if isinstance(route, tuple):
+            return _FakeResponse(*route)
+        return _FakeResponse(route)
+
+
+def test_sync_canvas_assignments_all_courses(db_session: Session):
+    """Test full Canvas sync collects assignments from every course in order"""
+    from src.services.integrations.lms import LMSService
+    
+    base = "https://canvas.test"
+    service = LMSService(db_session)
+    service.http = _FakeCanvas({
+        f"{base}/api/v1/courses": [{"id": 1}, {"id": 2}, {"id": 3}],
+        f"{base}/api/v1/courses/1/assignments": [{"id": "a1"}],
+        f"{base}/api/v1/courses/2/assignments": [],
+        f"{base}/api/v1/courses/3/assignments": [{"id": "c1"}, {"id": "c2"}]
+    })
+    
+    result = service.sync_canvas_assignments(api_token="token", canvas_url=base)
+    
+    assert result["success"] is True
+    assert [a["id"] for a in result["assignments"]] == ["a1", "c1", "c2"]
+    assert len(service.http.calls) == 4
+
+
+def test_sync_canvas_assignments_follows_pagination(db_session: Session):
+    """Test Canvas sync follows rel=next Link headers across pages"""
+    from src.services.integrations.lms import LMSService
+    
+    base = "https://canvas.test"
+    first = f"{base}/api/v1/courses/7/assignments"
+    second = f"{first}?page=2&per_page=100"
+    service = LMSService(db_session)
+    service.http = _FakeCanvas({
+        first: ([{"id": "p1"}, {"id": "p2"}], second),
+        second: [{"id": "p3"}]
+    })
+    
+    result = service.sync_canvas_assignments(api_token="token", canvas_url=base, course_id="7")
+    
+    assert result["success"] is True
+    assert [a["id"] for a in result["assignments"]] == ["p1", "p2", "p3"]
+    assert service.http.calls == [first, second]
+
+
+def test_sync_canvas_assignments_reuses_recent_sync(db_session: Session):
+    """Test repeated Canvas syncs with the same credentials hit the sync cache"""
+    from src.services.integrations.http import get_sync_cache
+    from src.services.integrations.lms import LMSService
+    
+    base = "https://canvas-cache.test"
+    url = f"{base}/api/v1/courses/9/assignments"
+    get_sync_cache().clear()
+    service = LMSService(db_session)
+    service.http = _FakeCanvas({url: [{"id": "x1"}]})
+    
+    first = service.sync_canvas_assignments(api_token="token", canvas_url=base, course_id="9")
+    second = service.sync_canvas_assignments(api_token="token", canvas_url=base, course_id="9")
+    other = service.sync_canvas_assignments(api_token="other-token", canvas_url=base, course_id="9")
+    
+    assert second == first
+    assert other["assignments"] == [{"id": "x1"}]
+    assert service.http.calls == [url, url]
+    get_sync_cache().clear()
+
+
+def test_sync_cache_is_bounded_and_returns_copies():
+    """Test the sync cache stays within its size limit and isolates callers"""
+    from src.services.integrations.http import SYNC_CACHE_MAX_SIZE, get_sync_cache
+    
+    cache = get_sync_cache()
+    cache.clear()
+    try:
+        for i in range(SYNC_CACHE_MAX_SIZE + 50):
+            cache.set(f"sync:{i}", {"success": True, "assignments": [{"id": i}]})
+        
+        assert cache.size() <= SYNC_CACHE_MAX_SIZE
+        # Oldest entries are evicted first
+        assert cache.get("sync:0") is None
+        
+        last = f"sync:{SYNC_CACHE_MAX_SIZE + 49}"
+        cache.get(last)["assignments"].append({"id": "mutated"})
+        assert cache.get(last)["assignments"] == [{"id": SYNC_CACHE_MAX_SIZE + 49}]
+    finally:
+        cache.clear()
+
+
+def test_circuit_breaker_opens_after_repeated_failures():
+    """Test the circuit opens on server errors, ignores 4xx, and recovers"""
+    import requests
+    from src.services.integrations.http import CircuitBreaker, CircuitOpenError
+    
+    breaker = CircuitBreaker("test", fail_max=2, reset_timeout=60)
+    calls = []
+    
+    def respond(status_code):
+        calls.append(status_code)
+        return _FakeResponse({}, status_code=status_code)
+    
+    def refuse():
+        calls.append("refused")
+        raise requests.exceptions.ConnectionError("refused")
+    
+    breaker.call(respond, 401)
+    breaker.call(respond, 503)
+    assert not breaker.is_open
+    with pytest.raises(requests.exceptions.ConnectionError):
+        breaker.call(refuse)
+    assert breaker.is_open
+    
+    # Open circuit rejects without calling the provider
+    with pytest.raises(CircuitOpenError):
+        breaker.call(respond, 200)
+    assert calls == [401, 503, "refused"]
+    
+    # After the reset timeout a success closes it again
+    breaker.reset_timeout = 0
+    breaker.call(respond, 200)
+    assert not breaker.is_open
+
+
+def test_canvas_circuit_breakers_are_per_host(db_session: Session):
+    """Test one failing Canvas instance does not open the circuit for another"""
+    from src.services.integrations.http import get_circuit_breaker
+    from src.services.integrations.lms import LMSService
+    
+    down = "https://canvas-down.test"
+    up = "https://canvas-up.test"
+    service = LMSService(db_session)
+    service.http = _FakeCanvas({
+        f"{down}/api/v1/courses/1/assignments": ([], None, 503),
+        f"{up}/api/v1/courses/1/assignments": [{"id": "u1"}]
+    })
+    
+    breaker = get_circuit_breaker("canvas:canvas-down.test")
+    for _ in range(breaker.fail_max):
+        service._sync_canvas_assignments("token", down, "1")
+    
+    assert breaker.is_open
+    assert not get_circuit_breaker("canvas:canvas-up.test").is_open
+    result = service._sync_canvas_assignments("token", up, "1")
+    assert result["assignments"] == [{"id": "u1"}]
+    
+    # The open circuit only rejects calls to the failing instance
+    calls_before = len(service.http.calls)
+    assert service._sync_canvas_assignments("token", down, "1")["success"] is False
+    assert len(service.http.calls) == calls_before
+
+
 def test_notification_service(db_session: Session):
     """Test notification service"""
     service = NotificationService(db_session)
@@ -167,6 +552,29 @@ def test_batch_notifications(db_session: Session):
     assert result["successful"] == 2
 
 
+def test_batch_notifications_isolates_failures(db_session: Session, monkeypatch):
+    """Test one failing send does not abort the rest of the batch"""
+    service = NotificationService(db_session)
+    original = service.send_push_notification
+    
+    def flaky_send(**kwargs):
+        if kwargs["title"] == "bad":
+            raise RuntimeError("provider unavailable")
+        return original(**kwargs)
+    
+    monkeypatch.setattr(service, "send_push_notification", flaky_send)
+    
+    result = service.send_batch_notifications([
+        {"user_id": "u1", "title": "ok", "body": "b"},
+        {"user_id": "u2", "title": "bad", "body": "b"},
+        {"user_id": "u3", "title": "ok", "body": "b"}
+    ])
+    
+    assert result["successful"] == 2
+    assert result["failed"] == 1
+    assert [r["success"] for r in result["results"]] == [True, False, True]
+
+
 def test_register_device_token(db_session: Session):
     """Test device token registration"""
     service = NotificationService(db_session)
@@ -0,0 +1,108 @@
+"""
+Nudge Engine Tests
+Tests for nudge eligibility checks (frequency cap, unopened nudges, bulk checks)
+"""
+
+import uuid
+from datetime import datetime, timezone
+from src.config.settings import settings
+from src.services.nudges.engine import NudgeEngine
+from tests.test_models import TestUser, TestNudge
+from sqlalchemy.orm import Session
+
+
+def _create_student(db_session: Session, name: str, profile: dict = None) -> TestUser:
+    student = TestUser(
+        id=str(uuid.uuid4()),
+        cognito_sub=f"{name}-sub",
+        email=f"{name}@test.com",
+        role="student",
+        profile=profile or {}
+    )
+    db_session.add(student)
+    db_session.commit()
+    return student
+
+
+def _add_nudges(db_session: Session, student: TestUser, count: int, opened: bool = True):
+    now = datetime.now(timezone.utc)
+    for _ in range(count):
+        db_session.add(TestNudge(
+            id=str(uuid.uuid4()),
+            user_id=student.id,
+            type="login",
+            channel="in_app",
+            message="Welcome back!",
+            sent_at=now,
+            opened_at=now if opened else None
+        ))
+    db_session.commit()
+
+
+def test_frequency_cap_reached_when_count_equals_cap(db_session: Session):
+    """Test the default cap blocks nudges once today's count reaches it"""
+    student = _create_student(db_session, "capped")
+    engine = NudgeEngine(db_session)
+    
+    _add_nudges(db_session, student, settings.default_nudge_frequency_cap - 1)
+    assert engine.should_send_nudge(student.id, "login")["should_send"] is True
+    
+    _add_nudges(db_session, student, 1)
+    result = engine.should_send_nudge(student.id, "login")
+    assert result["should_send"] is False
+    assert result["reason"] == "frequency_cap_reached"
+
+
+def test_profile_frequency_cap_overrides_default(db_session: Session):
+    """Test a student's nudge_frequency_cap preference replaces the default"""
+    cap = settings.default_nudge_frequency_cap + 2
+    student = _create_student(db_session, "custom-cap", {"preferences": {"nudge_frequency_cap": cap}})
+    engine = NudgeEngine(db_session)
+    
+    _add_nudges(db_session, student, cap - 1)
+    assert engine.should_send_nudge(student.id, "login")["should_send"] is True
+    
+    _add_nudges(db_session, student, 1)
+    assert engine.should_send_nudge(student.id, "login")["reason"] == "frequency_cap_reached"
+
+
+def test_unopened_nudges_block_all_but_inactivity(db_session: Session):
+    """Test an unopened recent nudge blocks new nudges except inactivity checks"""
+    student = _create_student(db_session, "unopened", {"preferences": {"nudge_frequency_cap": 5}})
+    _add_nudges(db_session, student, 1, opened=False)
+    engine = NudgeEngine(db_session)
+    
+    for check_type in ("login", "goal_completion"):
+        result = engine.should_send_nudge(student.id, check_type)
+        assert result == {"should_send": False, "reason": "unopened_nudges_exist"}
+    
+    # Inactivity still goes through its own threshold check
+    assert engine.should_send_nudge(student.id, "inactivity")["reason"] == "threshold_not_met"
+
+
+def test_bulk_checks_match_single_checks(db_session: Session):
+    """Test bulk nudge checks give each user the same result as a single check"""
+    fresh = _create_student(db_session, "fresh")
+    capped = _create_student(db_session, "bulk-capped")
+    _add_nudges(db_session, capped, settings.default_nudge_frequency_cap)
+    blocked = _create_student(db_session, "bulk-unopened", {"preferences": {"nudge_frequency_cap": 5}})
+    _add_nudges(db_session, blocked, 1, opened=False)
+    unknown = str(uuid.uuid4())
+    user_ids = [fresh.id, capped.id, blocked.id, unknown, "not-a-uuid"]
+    
+    results = NudgeEngine(db_session).should_send_nudges_bulk(user_ids, "login")
+    
+    engine = NudgeEngine(db_session)
+    for user_id in user_ids:
+        single = engine.should_send_nudge(user_id, "login")
+        # next_available is derived from each call's own clock
+        single.pop("next_available", None)
+        bulk = dict(results[user_id])
+        bulk.pop("next_available", None)
+        assert bulk == single
+    assert set(results) == set(user_ids)
+    assert results[fresh.id]["should_send"] is True
+    assert results[capped.id]["reason"] == "frequency_cap_reached"
+    assert results[blocked.id]["reason"] == "unopened_nudges_exist"
+    assert results[unknown] == {"should_send": False, "reason": "user_not_found"}
+    assert results["not-a-uuid"] == {"should_send": False, "reason": "invalid_user_id"}
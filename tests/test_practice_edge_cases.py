@@ -237,3 +237,26 @@ class TestPracticeEdgeCases:
         assert 0.0 <= score <= 1.0
         assert score < 1.0  # Should be penalized for hints
 
+    
+    def test_question_fingerprint_ignores_case_and_whitespace(self):
+        """Test repeat detection treats reworded casing/spacing as the same question"""
+        from src.services.practice.utils import question_fingerprint
+        
+        fp = question_fingerprint("What is 2 + 2?")
+        
+        assert question_fingerprint("  what is 2 + 2?\n") == fp
+        assert question_fingerprint("What is 2 + 3?") != fp
+        assert 0 <= fp < 2 ** 64
+    
+    def test_generate_choices_from_answer_batch(self):
+        """Test batched choice generation keeps order and marks the right letter"""
+        from src.services.practice.utils import generate_choices_from_answer_batch
+        
+        answers = ["x = 4", "Paris", "42"]
+        results = generate_choices_from_answer_batch(answers)
+        
+        assert len(results) == len(answers)
+        for answer, (choices, correct_answer) in zip(answers, results):
+            assert len(choices) == 4
+            assert [c[0] for c in choices] == ["A", "B", "C", "D"]
+            assert choices["ABCD".index(correct_answer)] == f"{correct_answer}) {answer}"